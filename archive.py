@@ -0,0 +1,146 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from sharedcache import ThreadConnections
+
+# Permanent archive of completed-match scorecards.
+#
+# A finished match's scorecard never changes, so the first time one is parsed
+# it is stored here, keyed by Cricbuzz match ID, and later requests are served
+# from disk without going upstream. Scorecards are stored as gzipped,
+# canonical JSON under the SHA-256 of that JSON (identical cards share one
+# blob), in a SQLite file shared by every worker (SCORECARD_ARCHIVE_PATH).
+# Entries are write-once per parser version: each card records the version of
+# the parser that built it, and a card from an older version counts as not
+# archived, so the next fetch of the match replaces it.
+
+ARCHIVE_PATH = os.environ.get("SCORECARD_ARCHIVE_PATH", "scorecard_archive.sqlite3")
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS blobs (
+        digest TEXT PRIMARY KEY,
+        data BLOB NOT NULL
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS scorecards (
+        match_id INTEGER PRIMARY KEY,
+        series_id INTEGER,
+        url TEXT NOT NULL,
+        digest TEXT NOT NULL REFERENCES blobs (digest),
+        archived_at REAL NOT NULL,
+        parser_version INTEGER NOT NULL DEFAULT 0
+    )""",
+    "CREATE INDEX IF NOT EXISTS scorecards_series ON scorecards (series_id, match_id)",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def canonical_json(data):
+    """The exact bytes a scorecard is stored (and hashed) as: sorted keys, compact, ASCII."""
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=True).encode("ascii")
+
+
+def _setup(conn):
+    for statement in _SCHEMA:
+        conn.execute(statement)
+    # Archives created before cards carried a parser version
+    if "parser_version" not in {row[1] for row in conn.execute("PRAGMA table_info(scorecards)")}:
+        conn.execute("ALTER TABLE scorecards ADD COLUMN parser_version INTEGER NOT NULL DEFAULT 0")
+
+
+class ScorecardArchive:
+    """Write-once store of scorecard JSON, by match ID, with per-series listing."""
+
+    def __init__(self, path=ARCHIVE_PATH, version=0):
+        self.path = path
+        self.version = version  # of the scorecard parser; cards from older ones are not served
+        self._connections = ThreadConnections(path, timeout=5, setup=_setup)
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    def get(self, match_id):
+        """Return (url, series_id, canonical JSON bytes) for an archived match, or None."""
+        try:
+            row = self._connections.get().execute(
+                "SELECT s.url, s.series_id, b.data FROM scorecards s JOIN blobs b ON b.digest = s.digest"
+                " WHERE s.match_id = ? AND s.parser_version = ?",
+                (match_id, self.version),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Could not read scorecard archive %s: %s", self.path, e)
+            return None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        url, series_id, data = row
+        return url, series_id, gzip.decompress(data)
+
+    def series(self, series_id):
+        """(match_id, url, canonical JSON bytes) for every archived match of a series, by match ID."""
+        try:
+            rows = self._connections.get().execute(
+                "SELECT s.match_id, s.url, b.data FROM scorecards s JOIN blobs b ON b.digest = s.digest"
+                " WHERE s.series_id = ? AND s.parser_version = ? ORDER BY s.match_id",
+                (series_id, self.version),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Could not read scorecard archive %s: %s", self.path, e)
+            return []
+        return [(match_id, url, gzip.decompress(data)) for match_id, url, data in rows]
+
+    def add(self, match_id, series_id, url, data):
+        """
+        Archive a completed match's scorecard. A match already archived by
+        this parser version is left as it is; one from an older version is
+        replaced (and its blob dropped once no card uses it).
+        """
+        body = canonical_json(data)
+        digest = hashlib.sha256(body).hexdigest()
+        try:
+            conn = self._connections.get()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = conn.execute("SELECT digest, parser_version FROM scorecards WHERE match_id = ?",
+                                   (match_id,)).fetchone()
+                added = old is None or old[1] < self.version
+                if added:
+                    conn.execute("INSERT OR IGNORE INTO blobs (digest, data) VALUES (?, ?)",
+                                 (digest, gzip.compress(body, mtime=0)))
+                    conn.execute(
+                        "INSERT OR REPLACE INTO scorecards (match_id, series_id, url, digest, archived_at, parser_version)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (match_id, series_id, url, digest, time.time(), self.version),
+                    )
+                    if old is not None and old[0] != digest:
+                        conn.execute("DELETE FROM blobs WHERE digest = ? AND NOT EXISTS"
+                                     " (SELECT 1 FROM scorecards WHERE digest = ?)", (old[0], old[0]))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning("Could not write scorecard archive %s: %s", self.path, e)
+            return False
+        self.stored += added
+        return bool(added)
+
+    def stats(self):
+        try:
+            matches, outdated, blobs, size = self._connections.get().execute(
+                "SELECT (SELECT COUNT(*) FROM scorecards WHERE parser_version = ?),"
+                " (SELECT COUNT(*) FROM scorecards WHERE parser_version < ?), (SELECT COUNT(*) FROM blobs),"
+                " (SELECT COALESCE(SUM(LENGTH(data)), 0) FROM blobs)",
+                (self.version, self.version),
+            ).fetchone()
+        except sqlite3.Error:
+            matches = outdated = blobs = size = None
+        return {"parser_version": self.version, "matches": matches, "outdated": outdated, "blobs": blobs,
+                "compressed_bytes": size,
+                "hits": self.hits, "misses": self.misses, "stored": self.stored}
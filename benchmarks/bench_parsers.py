@@ -0,0 +1,183 @@
+"""
+Offline benchmark for the page parsers in main.py.
+
+Runs every route's parsing logic against the saved pages in
+benchmarks/fixtures (no network) and reports ops/sec, p50/p99 latency and
+peak memory per parser. With a baseline file it fails (exit status 1) when
+a parser's p50 or peak memory regresses by more than --threshold.
+
+Timings only compare on the same machine, so the baseline is not checked in:
+record it with --save on the machine that runs --check (e.g. on the base
+commit, then check the change). A baseline recorded on another host or
+Python version is refused rather than compared.
+
+    python benchmarks/bench_parsers.py                      # report only
+    python benchmarks/bench_parsers.py --save               # record benchmarks/baseline.json
+    python benchmarks/bench_parsers.py --check              # compare against it
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures")
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+
+# Bump when a fixture is added or changed; baselines from another corpus version are not compared
+CORPUS_VERSION = 1
+
+sys.path.insert(0, os.path.dirname(HERE))
+import main  # noqa: E402
+
+
+def _environment():
+    """Where results were measured; baselines from anywhere else are not compared."""
+    return {"host": platform.node(), "machine": platform.machine(),
+            "python": f"{platform.python_implementation()} {platform.python_version()}"}
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def _player(search_html, profile_html):
+    main.parse_player_search(search_html)
+    return main.parse_player_profile(profile_html)
+
+
+# route -> (parse callable, fixture names it is called with)
+CASES = {
+    "live_matches": (main.parse_live_matches, ["live-scores.html"]),
+    "schedule": (main.parse_schedule, ["schedule.html"]),
+    "all_series": (main.parse_all_series, ["all-series.html"]),
+    "get_ipl_schedule": (lambda html: main.parse_ipl_schedule(html, 2025), ["ipl-matches.html"]),
+    "scrape_points_table": (lambda html: main.summarize_points_table(main.parse_detailed_points_table(html)), ["points-table.html"]),
+    "scrape_detailed_points_table": (main.parse_detailed_points_table, ["points-table.html"]),
+    "scrape_scorecard": (main.parse_scorecard, ["scorecard.html"]),
+    "get_player": (_player, ["google-search.html", "player-profile.html"]),
+}
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_case(parse, pages, iterations, warmup, rounds):
+    result = parse(*pages)
+    if isinstance(result, dict) and "error" in result:
+        raise RuntimeError(f"parser returned an error: {result['error']}")
+
+    for _ in range(warmup):
+        parse(*pages)
+
+    # Several rounds, keeping the quietest one: on a shared machine a single
+    # round's median moves with whatever else is running
+    best, samples = None, []
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            round_samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                parse(*pages)
+                round_samples.append(time.perf_counter() - start)
+            samples.extend(round_samples)
+            if best is None or statistics.median(round_samples) < statistics.median(best):
+                best = round_samples
+    finally:
+        gc.enable()
+
+    # Memory is measured on a separate run; tracemalloc slows everything down
+    tracemalloc.start()
+    parse(*pages)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "ops_per_sec": round(1 / statistics.mean(best), 1),
+        "p50_ms": round(_percentile(best, 0.50) * 1000, 3),
+        "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return a message per parser whose p50 or peak memory got worse than baseline * (1 + threshold)."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ("p50_ms", "peak_kib"):
+            limit = previous[metric] * (1 + threshold)
+            if current[metric] > limit:
+                regressions.append(f"{name}: {metric} {current[metric]} > {previous[metric]} (+{threshold:.0%} allowed)")
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--iterations", type=int, default=100, help="timed runs per round (default 100)")
+    parser.add_argument("-r", "--rounds", type=int, default=5, help="rounds per parser; the fastest round is reported (default 5)")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed runs before timing (default 20)")
+    parser.add_argument("-k", "--only", action="append", choices=sorted(CASES), help="run just this parser (repeatable)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="write the results to the baseline file")
+    parser.add_argument("--check", action="store_true", help="fail on regressions against the baseline file")
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed regression as a fraction (default 0.5)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.only or CASES:
+        parse, fixture_names = CASES[name]
+        pages = [_fixture(fixture) for fixture in fixture_names]
+        results[name] = run_case(parse, pages, args.iterations, args.warmup, args.rounds)
+
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print(f"{'parser':<30}{'ops/sec':>10}{'p50 ms':>10}{'p99 ms':>10}{'peak KiB':>10}")
+        for name, r in results.items():
+            print(f"{name:<30}{r['ops_per_sec']:>10}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['peak_kib']:>10}")
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"corpus_version": CORPUS_VERSION, "environment": _environment(), "results": results},
+                      f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; record one on this machine with --save first")
+            return 1
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("corpus_version") != CORPUS_VERSION:
+            print(f"Baseline is for corpus version {baseline.get('corpus_version')}, not {CORPUS_VERSION}; re-record it with --save")
+            return 1
+        if baseline.get("environment") != _environment():
+            print(f"Baseline was recorded on {baseline.get('environment')}, not {_environment()}; "
+                  "timings only compare on one machine, so re-record it here with --save")
+            return 1
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print("Regressions:")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,296 @@
+"""
+Offline end-to-end load test.
+
+Starts the replay server, runs the app under gunicorn with the command line
+from the Dockerfile (pointed at the replay server), then drives every route
+from --concurrency client threads for --duration seconds and reports
+throughput and latency percentiles per route.
+
+First, on the cold app, a POST /players with 25 distinct names (more than
+the per-host burst allowance) has to return every player; otherwise the
+script exits with status 1 after the report.
+
+    python benchmarks/loadtest.py --duration 30 --concurrency 32
+    python benchmarks/loadtest.py --workers 4 --threads 16 --latency 150 --jitter 50
+    python benchmarks/loadtest.py --target http://127.0.0.1:8080    # an app that is already running
+"""
+import argparse
+import json
+import os
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from replay_server import make_server
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# Flask rule -> request sent for it; every route in main.py should be listed
+ROUTE_REQUESTS = {
+    "/": ("GET", "/", None),
+    "/metrics": ("GET", "/metrics", None),
+    "/players/<player_name>": ("GET", "/players/virat%20kohli", None),
+    "/players": ("POST", "/players", {"names": ["Virat Kohli", "Rohit Sharma", "Jasprit Bumrah"]}),
+    "/schedule": ("GET", "/schedule", None),
+    "/live": ("GET", "/live", None),
+    "/live/stream": ("STREAM", "/live/stream", None),
+    "/scrape/scorecard": ("GET", "/scrape/scorecard?url=https://www.cricbuzz.com/live-cricket-scorecard/115102/csk-vs-mi", None),
+    "/archive/scorecards/<int:match_id>": ("GET", "/archive/scorecards/115102", None),
+    "/archive/series/<int:series_id>": ("GET", "/archive/series/9237", None),
+    "/all-series": ("GET", "/all-series", None),
+    "/ipl-schedule/<int:year>/<int:series_id>": ("GET", "/ipl-schedule/2025/9237", None),
+    "/ipl-schedule/<int:year>": ("GET", "/ipl-schedule/2025", None),
+    "/series/<int:series_id>": ("GET", "/series/9237", None),
+    "/series/search": ("GET", "/series/search?q=premier", None),
+    "/series/<int:series_id>/points-table": ("GET", "/series/9596/points-table", None),
+    "/series/<int:series_id>/detailed-points-table": ("GET", "/series/9596/detailed-points-table", None),
+    "/ipl/2025/points-table": ("GET", "/ipl/2025/points-table", None),
+    "/ipl/2025/detailed-points-table": ("GET", "/ipl/2025/detailed-points-table", None),
+    "/matches": ("GET", "/matches?from=2025-03-22&to=2025-03-31&team=mumbai", None),
+    "/matches/next": ("GET", "/matches/next?team=chennai&from=2025-03-22", None),
+}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def dockerfile_gunicorn_args(path=os.path.join(ROOT, "Dockerfile")):
+    """The gunicorn arguments from the Dockerfile's CMD (exec or shell form)."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("CMD"):
+                command = line[3:].strip()
+                args = json.loads(command) if command.startswith("[") else shlex.split(command)
+                return args[args.index("gunicorn") + 1:]
+    raise RuntimeError(f"No CMD in {path}")
+
+
+def _set_option(args, name, value):
+    args = list(args)
+    if name in args:
+        args[args.index(name) + 1] = value
+    else:
+        args[:0] = [name, value]
+    return args
+
+
+def start_app(port, replay_url, workers=None, threads=None):
+    args = _set_option(dockerfile_gunicorn_args(), "--bind", f"127.0.0.1:{port}")
+    if workers:
+        args = _set_option(args, "--workers", str(workers))
+    if threads:
+        args = _set_option(args, "--threads", str(threads))
+    # Fresh player index, shared cache and archive, so every run starts cold
+    scratch = tempfile.mkdtemp(prefix="loadtest-")
+    env = dict(
+        os.environ,
+        CRICBUZZ_BASE_URL=replay_url,
+        GOOGLE_BASE_URL=replay_url,
+        PLAYER_INDEX_PATH=os.path.join(scratch, "player_index.json"),
+        ROUTE_CACHE_DB=os.path.join(scratch, "route_cache.sqlite3"),
+        SCORECARD_ARCHIVE_PATH=os.path.join(scratch, "scorecard_archive.sqlite3"),
+    )
+    print("gunicorn " + " ".join(args))
+    return subprocess.Popen([sys.executable, "-m", "gunicorn", *args], cwd=ROOT, env=env)
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(base_url + "/", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{base_url} did not come up within {timeout}s")
+
+
+def send(session, base_url, method, path, body):
+    """Issue one request; returns its status. A stream counts as done at its first event."""
+    if method == "STREAM":
+        with session.get(base_url + path, stream=True, timeout=30) as response:
+            for line in response.iter_lines():
+                if not line:
+                    break
+            return response.status_code
+    if method == "POST":
+        return session.post(base_url + path, json=body, timeout=60).status_code
+    return session.get(base_url + path, timeout=60).status_code
+
+
+# A cold squad lookup: more names than the per-host burst allowance
+SQUAD = [
+    "Virat Kohli", "Rohit Sharma", "Jasprit Bumrah", "Shubman Gill", "Rishabh Pant", "KL Rahul",
+    "Hardik Pandya", "Ravindra Jadeja", "Mohammed Siraj", "Kuldeep Yadav", "Axar Patel", "Suryakumar Yadav",
+    "Shreyas Iyer", "Yashasvi Jaiswal", "Arshdeep Singh", "Mohammed Shami", "Washington Sundar", "Sanju Samson",
+    "Ishan Kishan", "Ruturaj Gaikwad", "Tilak Varma", "Rinku Singh", "Abhishek Sharma", "Varun Chakravarthy",
+    "Ravi Bishnoi",
+]
+
+
+def check_squad_batch(base_url):
+    """POST /players with the whole SQUAD on a cold app; returns the names that came back with an error."""
+    response = requests.post(base_url + "/players", json={"names": SQUAD}, timeout=120)
+    response.raise_for_status()
+    return [player["name"] for player in response.json()["players"] if player["status"] != 200]
+
+
+def drive(base_url, routes, concurrency, duration):
+    """Closed-loop load: each client thread cycles through the routes until time is up."""
+    samples = {rule: [] for rule in routes}
+    errors = {rule: {} for rule in routes}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(offset):
+        session = requests.Session()
+        rules = list(routes)
+        i = offset
+        while time.perf_counter() < deadline:
+            rule = rules[i % len(rules)]
+            i += 1
+            method, path, body = routes[rule]
+            start = time.perf_counter()
+            try:
+                status = send(session, base_url, method, path, body)
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[rule].append(elapsed)
+                if status != 200:
+                    errors[rule][status] = errors[rule].get(status, 0) + 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, errors, time.perf_counter() - started
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(samples, errors, elapsed):
+    report = {"elapsed_s": round(elapsed, 2), "routes": {}}
+    total = 0
+    for rule, latencies in samples.items():
+        if not latencies:
+            continue
+        ordered = sorted(latencies)
+        total += len(ordered)
+        report["routes"][rule] = {
+            "requests": len(ordered),
+            "rps": round(len(ordered) / elapsed, 1),
+            "mean_ms": round(statistics.mean(ordered) * 1000, 1),
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 1),
+            "p90_ms": round(_percentile(ordered, 0.90) * 1000, 1),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 1),
+            "max_ms": round(ordered[-1] * 1000, 1),
+            "errors": {str(k): v for k, v in errors[rule].items()},
+        }
+    report["requests"] = total
+    report["rps"] = round(total / elapsed, 1)
+    return report
+
+
+def print_report(report):
+    print(f"\n{'route':<42}{'reqs':>7}{'rps':>8}{'p50':>8}{'p90':>8}{'p99':>8}{'max':>9}  errors")
+    for rule, r in report["routes"].items():
+        errors = ", ".join(f"{k}x{v}" for k, v in r["errors"].items()) or "-"
+        print(f"{rule:<42}{r['requests']:>7}{r['rps']:>8}{r['p50_ms']:>8}{r['p90_ms']:>8}{r['p99_ms']:>8}{r['max_ms']:>9}  {errors}")
+    print(f"\n{report['requests']} requests in {report['elapsed_s']}s: {report['rps']} req/s (latencies in ms)")
+    if "upstream" in report:
+        print(f"Upstream (replay) responses by status: {report['upstream']}")
+
+
+def check_coverage(routes):
+    # Flag routes added to main.py without a request here
+    sys.path.insert(0, ROOT)
+    import main
+    rules = {str(rule) for rule in main.app.url_map.iter_rules() if rule.endpoint != "static"}
+    missing = sorted(rules - set(routes))
+    if missing:
+        print(f"Warning: no load-test request for {', '.join(missing)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load (default 20)")
+    parser.add_argument("--concurrency", type=int, default=16, help="client threads (default 16)")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds of unmeasured load first (default 2)")
+    parser.add_argument("--target", help="base URL of an already running app; skips replay and gunicorn")
+    parser.add_argument("--workers", type=int, help="override gunicorn --workers")
+    parser.add_argument("--threads", type=int, help="override gunicorn --threads")
+    parser.add_argument("--latency", type=float, default=50, help="replay mean latency in ms (default 50)")
+    parser.add_argument("--jitter", type=float, default=20, help="replay latency jitter in ms (default 20)")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of replay responses that are 503")
+    parser.add_argument("--rate-limit", type=float, default=0, help="fraction of replay responses that are 429")
+    parser.add_argument("-k", "--only", action="append", choices=sorted(ROUTE_REQUESTS), help="load just this route (repeatable)")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    # A stream keeps its server thread until the next heartbeat notices the
+    # client left, so streams are only loaded when asked for with -k
+    default = [rule for rule, (method, _, _) in ROUTE_REQUESTS.items() if method != "STREAM"]
+    routes = {rule: ROUTE_REQUESTS[rule] for rule in (args.only or default)}
+    replay_server = app = None
+    try:
+        if args.target:
+            base_url = args.target.rstrip("/")
+        else:
+            check_coverage(ROUTE_REQUESTS)
+            replay_port, app_port = _free_port(), _free_port()
+            replay_server = make_server(
+                port=replay_port, latency=args.latency / 1000, jitter=args.jitter / 1000,
+                error_rate=args.error_rate, rate_limit=args.rate_limit,
+            )
+            threading.Thread(target=replay_server.serve_forever, daemon=True).start()
+            app = start_app(app_port, f"http://127.0.0.1:{replay_port}", args.workers, args.threads)
+            base_url = f"http://127.0.0.1:{app_port}"
+            wait_until_up(base_url)
+
+        squad_failures = check_squad_batch(base_url)
+        print(f"Cold /players batch of {len(SQUAD)} names: "
+              + (f"{len(squad_failures)} failed ({', '.join(squad_failures)})" if squad_failures else "ok"))
+
+        if args.warmup:
+            drive(base_url, routes, args.concurrency, args.warmup)
+        upstream_before = dict(replay_server.RequestHandlerClass.replay.counts) if replay_server else None
+        report = summarize(*drive(base_url, routes, args.concurrency, args.duration))
+        report["concurrency"] = args.concurrency
+        if replay_server:
+            counts = replay_server.RequestHandlerClass.replay.counts
+            report["upstream"] = {str(k): v - upstream_before.get(k, 0) for k, v in counts.items()}
+    finally:
+        if app is not None:
+            app.terminate()
+            app.wait(timeout=30)
+        if replay_server is not None:
+            replay_server.shutdown()
+
+    report["squad_batch_failures"] = squad_failures
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if squad_failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
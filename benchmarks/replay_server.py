@@ -0,0 +1,143 @@
+"""
+Local stand-in for Cricbuzz (and the Google search hop) that replays the
+saved pages in benchmarks/fixtures.
+
+    python benchmarks/replay_server.py --port 8900 --latency 80 --jitter 40 --error-rate 0.01 --rate-limit 0.02
+
+    CRICBUZZ_BASE_URL=http://127.0.0.1:8900 GOOGLE_BASE_URL=http://127.0.0.1:8900 gunicorn main:app
+
+Every response carries an ETag and honours If-None-Match, so the app's
+conditional revalidation behaves as it does against the real site.
+Injected failures are 503s (--error-rate) and 429s with Retry-After
+(--rate-limit).
+"""
+import argparse
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures")
+
+# URL path pattern -> fixture served for it
+ROUTES = [
+    (re.compile(r"^/search$"), "google-search.html"),
+    (re.compile(r"^/profiles/\d+"), "player-profile.html"),
+    (re.compile(r"^/cricket-schedule/upcoming-series/"), "schedule.html"),
+    (re.compile(r"^/cricket-match/live-scores"), "live-scores.html"),
+    (re.compile(r"^/cricket-schedule/series/all"), "all-series.html"),
+    (re.compile(r"^/cricket-series/\d+/[^/]+/matches"), "ipl-matches.html"),
+    (re.compile(r"^/cricket-series/\d+/[^/]+/points-table"), "points-table.html"),
+    (re.compile(r"^/live-cricket-scorecard/\d+"), "scorecard.html"),
+]
+
+
+class Replay:
+    """Fixture bodies plus the configured latency and failure injection."""
+
+    def __init__(self, fixtures=FIXTURES, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit=0.0, retry_after=1):
+        self.pages = {}
+        for _, name in ROUTES:
+            with open(os.path.join(fixtures, name), "rb") as f:
+                body = f.read()
+            self.pages[name] = (body, '"%s"' % hashlib.sha1(body).hexdigest())
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def count(self, status):
+        with self._lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+
+    def delay(self):
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def match(self, path):
+        for pattern, name in ROUTES:
+            if pattern.search(path):
+                return self.pages[name]
+        return None
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    replay = None
+
+    def do_GET(self):
+        replay = self.replay
+        time.sleep(replay.delay())
+        page = replay.match(urlsplit(self.path).path)
+        roll = random.random()
+
+        if page is None:
+            self._send(404, b"not found")
+        elif roll < replay.rate_limit:
+            self._send(429, b"rate limited", {"Retry-After": str(replay.retry_after)})
+        elif roll < replay.rate_limit + replay.error_rate:
+            self._send(503, b"injected error")
+        else:
+            body, etag = page
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, b"", {"ETag": etag})
+            else:
+                self._send(200, body, {"ETag": etag, "Content-Type": "text/html; charset=utf-8"})
+
+    def _send(self, status, body, headers=None):
+        self.replay.count(status)
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="127.0.0.1", port=8900, **options):
+    """Build (but do not start) a threaded replay server; options go to Replay."""
+    handler = type("Handler", (ReplayHandler,), {"replay": Replay(**options)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--fixtures", default=FIXTURES, help="directory of recorded pages")
+    parser.add_argument("--latency", type=float, default=0, help="mean response delay in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="+/- random delay in ms")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests answered with 503")
+    parser.add_argument("--rate-limit", type=float, default=0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host, args.port, fixtures=args.fixtures,
+        latency=args.latency / 1000, jitter=args.jitter / 1000,
+        error_rate=args.error_rate, rate_limit=args.rate_limit, retry_after=args.retry_after,
+    )
+    print(f"Replaying {args.fixtures} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Responses by status: {server.RequestHandlerClass.replay.counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+import functools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, request
+
+import metrics
+import payload
+import scheduler
+import sharedcache
+
+# Per-route response cache.
+#
+#   @app.route('/schedule')
+#   @cached(ttl=900)
+#   def schedule(): ...
+#
+# Successful (200) responses are kept per request path + query string in a
+# bounded LRU. Within `ttl` seconds an entry is served as-is; for a further
+# `stale_ttl` seconds it is still served immediately while one background
+# thread re-runs the view to refresh it (stale-while-revalidate).
+#
+# Entries keep the response bytes plus compressed variants and an ETag made
+# when the entry is stored (payload.py); a hit only picks the variant the
+# client accepts. Responses carry Cache-Control max-age for the rest of the
+# entry's TTL.
+#
+# Entries are also written to the host-wide shared cache (sharedcache.py),
+# which is consulted whenever the local copy is missing or expired, so the
+# workers share one upstream fetch per entry and refresh it only once.
+#
+# A view can cache its response for a different time than the route's `ttl`
+# with set_ttl(), e.g. from scheduler.interval_for() over the matches it
+# shows. Background refreshes are skipped (the stale entry keeps being
+# served) while the worker's upstream budget is spent.
+#
+# When the view fails with a 5xx (typically the upstream host is down, rate
+# limited or behind an open circuit breaker, see upstream.py), the last good
+# response is served instead if it is less than STALE_IF_ERROR seconds past
+# its stale window. Any response served after its TTL carries X-Stale-Age,
+# the seconds since it was fetched.
+
+DEFAULT_MAXSIZE = 256
+
+# How long a worker may hold the shared refresh lease for one entry (seconds)
+REFRESH_LEASE = 60
+
+STALE_IF_ERROR = float(os.environ.get("ROUTE_CACHE_STALE_IF_ERROR", str(24 * 3600)))
+
+shared = sharedcache.SharedCache(keep=STALE_IF_ERROR) if sharedcache.DB_PATH else None
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def set_ttl(seconds):
+    """Cache the response the current view returns for `seconds` instead of its route's TTL."""
+    g._cache_ttl = seconds
+
+
+class _Entry:
+    __slots__ = ("body", "status", "mimetype", "stored_at", "expires", "stale_until", "variants", "tag")
+
+    def __init__(self, body, status, mimetype, stored_at, expires, stale_until):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.stored_at = stored_at
+        self.expires = expires
+        self.stale_until = stale_until
+        with metrics.timed("compress"):
+            self.variants = payload.compress(body)
+        self.tag = payload.etag(body)
+
+
+class RouteCache:
+    """Bounded LRU of rendered responses for one route, with hit/miss counters."""
+
+    def __init__(self, name, ttl, maxsize=DEFAULT_MAXSIZE, stale_ttl=None, shared=shared):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.stale_ttl = ttl if stale_ttl is None else stale_ttl
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.budget_skips = 0
+        self.fallbacks = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if self.shared is not None and (entry is None or time.time() >= entry.expires):
+            # Another worker may have fetched or refreshed it already
+            row = self.shared.get(self.name, key)
+            if row is not None and (entry is None or row[3] > entry.stored_at):
+                entry = self._remember(key, _Entry(*row))
+                self.shared_hits += 1
+        return entry
+
+    def fallback(self, key, entry):
+        """The last good response for `key` to serve in place of a failed one (entry: the local copy), or None."""
+        if entry is not None and time.time() - entry.stale_until < STALE_IF_ERROR:
+            return entry
+        if self.shared is not None:
+            row = self.shared.get(self.name, key, grace=STALE_IF_ERROR)
+            if row is not None:
+                return self._remember(key, _Entry(*row))
+        return None
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def put(self, key, response, ttl=None):
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        entry = _Entry(response.get_data(), response.status_code, response.mimetype,
+                       now, now + ttl, now + ttl + self.stale_ttl)
+        self._remember(key, entry)
+        if self.shared is not None:
+            self.shared.put(self.name, key, entry.body, entry.status, entry.mimetype,
+                            entry.stored_at, entry.expires, entry.stale_until)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.shared is not None:
+            self.shared.clear(self.name)
+
+    def stats(self):
+        return {
+            "ttl": self.ttl,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "shared_hits": self.shared_hits,
+            "evictions": self.evictions,
+            "refreshes": self.refreshes,
+            "budget_skips": self.budget_skips,
+            "fallbacks": self.fallbacks,
+        }
+
+    def _start_refresh(self, key, app, view, args, kwargs, path, query_string):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        if not scheduler.budget.allow():
+            # Out of upstream budget; keep serving the stale entry for now
+            self.budget_skips += 1
+            with self._lock:
+                self._refreshing.discard(key)
+            return
+        if self.shared is not None and not self.shared.claim_refresh(self.name, key, REFRESH_LEASE):
+            # Another worker is refreshing it; its result arrives through the shared cache
+            with self._lock:
+                self._refreshing.discard(key)
+            return
+
+        def refresh():
+            try:
+                with metrics.collecting(f"refresh:{self.name}"), app.test_request_context(path, query_string=query_string):
+                    response = app.make_response(view(*args, **kwargs))
+                    if response.status_code == 200:
+                        self.put(key, response, g.pop("_cache_ttl", None))
+                        self.refreshes += 1
+            except Exception:
+                logger.exception("Background refresh failed for %s", key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"refresh-{self.name}", daemon=True).start()
+
+
+def _serve(entry):
+    response = payload.respond(entry.body, entry.variants, entry.status, entry.mimetype, entry.tag)
+    response.cache_control.public = True
+    now = time.time()
+    response.cache_control.max_age = max(0, int(entry.expires - now))
+    if now >= entry.expires:
+        response.headers["X-Stale-Age"] = str(int(now - entry.stored_at))
+    return response
+
+
+def cached(ttl, maxsize=DEFAULT_MAXSIZE, stale_ttl=None):
+    """Cache a Flask view's successful responses for `ttl` seconds (see module notes)."""
+    def decorator(view):
+        route_cache = RouteCache(view.__name__, ttl, maxsize, stale_ttl)
+        _registry[view.__name__] = route_cache
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.full_path
+            entry = route_cache.get(key)
+            now = time.time()
+            if entry is not None:
+                if now < entry.expires:
+                    route_cache.hits += 1
+                    metrics.note("cache", "hit")
+                    return _serve(entry)
+                if now < entry.stale_until:
+                    route_cache.stale_hits += 1
+                    metrics.note("cache", "stale")
+                    route_cache._start_refresh(key, current_app._get_current_object(), view, args, kwargs,
+                                               request.path, request.query_string)
+                    return _serve(entry)
+
+            route_cache.misses += 1
+            metrics.note("cache", "miss")
+            response = current_app.make_response(view(*args, **kwargs))
+            ttl = g.pop("_cache_ttl", None)
+            if response.status_code == 200:
+                return _serve(route_cache.put(key, response, ttl))
+            if response.status_code >= 500:
+                fallback = route_cache.fallback(key, entry)
+                if fallback is not None:
+                    route_cache.fallbacks += 1
+                    metrics.note("fallback", "stale")
+                    return _serve(fallback)
+            return response
+
+        wrapper.cache = route_cache
+        return wrapper
+    return decorator
+
+
+def stats():
+    """Counters for every cached route, keyed by view name."""
+    return {name: route_cache.stats() for name, route_cache in _registry.items()}
+
+
+def shared_stats():
+    """Counters for the host-wide shared cache, or None when it is disabled."""
+    return shared.stats() if shared is not None else None
+
+
+def _metric_lines():
+    lookups, ratios, sizes, shared_loads, fallbacks = [], [], [], [], []
+    for name, route_cache in _registry.items():
+        total = route_cache.hits + route_cache.stale_hits + route_cache.misses
+        lookups += [((name, "hit"), route_cache.hits), ((name, "stale"), route_cache.stale_hits), ((name, "miss"), route_cache.misses)]
+        shared_loads.append(((name,), route_cache.shared_hits))
+        fallbacks.append(((name,), route_cache.fallbacks))
+        ratios.append(((name,), round((route_cache.hits + route_cache.stale_hits) / total, 4) if total else 0))
+        sizes.append(((name,), len(route_cache._entries)))
+    return (
+        metrics.family("route_cache_lookups_total", "counter", "Route cache lookups, by view and result.", ("view", "result"), lookups)
+        + metrics.family("route_cache_hit_ratio", "gauge", "Fraction of lookups served from cache (fresh or stale).", ("view",), ratios)
+        + metrics.family("route_cache_entries", "gauge", "Responses currently cached.", ("view",), sizes)
+        + metrics.family("route_cache_shared_loads_total", "counter", "Entries taken from the host-wide shared cache.", ("view",), shared_loads)
+        + metrics.family("route_cache_fallbacks_total", "counter", "Failed responses replaced by the last good cached copy.", ("view",), fallbacks)
+        + metrics.family("route_cache_shared_errors_total", "counter", "Shared cache database errors.", (), [((), shared.errors if shared is not None else 0)])
+    )
+
+
+metrics.add_collector(_metric_lines)
@@ -0,0 +1,105 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from lxml import etree
+from lxml import html as lxml_html
+
+import metrics
+
+# Thin extraction layer over lxml used by the page parsers in main.py.
+#
+# Parsers compile their selectors once at import with xpath(), using the
+# has_class()/class_is() predicates, which mirror BeautifulSoup's class_
+# matching: a single class name matches any element carrying that class, while
+# a space-separated string must equal the whole class attribute.
+#
+# FragmentCache lets a parser skip re-extracting parts of a page that are
+# byte-for-byte the same as on a previous fetch.
+
+_EMPTY_DOCUMENT = "<html></html>"
+
+
+def parse_html(source):
+    """Parse an HTML document (str or bytes) into an lxml root element."""
+    if not source or not source.strip():
+        source = _EMPTY_DOCUMENT
+    with metrics.timed("html"):
+        return lxml_html.document_fromstring(source)
+
+
+def xpath(expression):
+    """Compile an XPath expression once; call the result with a context element."""
+    return etree.XPath(expression)
+
+
+def has_class(name):
+    """XPath predicate: the element's class list contains `name`."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def class_is(value):
+    """XPath predicate: the element's class attribute is exactly `value` (whitespace-normalised)."""
+    return f"normalize-space(@class)='{value}'"
+
+
+def first(selector, element):
+    """First match of a compiled selector under `element`, or None."""
+    results = selector(element)
+    return results[0] if results else None
+
+
+# BeautifulSoup's .text leaves out script/style/template contents; so do we
+_TEXT_NODES = etree.XPath("descendant-or-self::text()[not(ancestor::script or ancestor::style or ancestor::template)]")
+_PRESERVE_WHITESPACE = etree.XPath("boolean(ancestor-or-self::pre or ancestor-or-self::textarea)")
+_ASCII_SPACES = " \n\t\f\r"
+
+
+def _normalize(node):
+    # BeautifulSoup collapses whitespace-only strings outside <pre>/<textarea>
+    if node.strip(_ASCII_SPACES) or _PRESERVE_WHITESPACE(node.getparent()):
+        return node
+    return "\n" if "\n" in node else " "
+
+
+def text(element):
+    """All text inside `element`, like BeautifulSoup's .text."""
+    return "".join(_normalize(node) for node in _TEXT_NODES(element))
+
+
+def fingerprint(element):
+    """Digest of an element's serialized HTML (without its tail text)."""
+    return hashlib.blake2b(etree.tostring(element, with_tail=False), digest_size=16).digest()
+
+
+class FragmentCache:
+    """
+    Bounded memo of values extracted from HTML fragments, keyed by fingerprint.
+
+    extract() only calls the extraction function for a fragment (plus extra
+    arguments) it has not seen; otherwise it returns the earlier value, which
+    callers must therefore not mutate.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def extract(self, element, extract, *args):
+        key = (fingerprint(element), args)
+        with self._lock:
+            value = self._values.get(key)
+            if value is not None:
+                self._values.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = extract(element, *args)
+        with self._lock:
+            self._values[key] = value
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+        return value
@@ -0,0 +1,266 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque, namedtuple
+
+import requests
+
+import metrics
+import payload
+import scheduler
+import upstream
+
+# Background poller for the live-scores page.
+#
+# A background job per worker (scheduler.py) refetches the page and publishes
+# an immutable Snapshot. /live only reads the current snapshot, so its
+# latency no longer depends on Cricbuzz and client QPS does not turn into
+# upstream QPS. The poll interval is POLL_INTERVAL, or whatever the `policy`
+# callable makes of the latest match list (e.g. faster while a match is live).
+#
+# Each good snapshot is also written to the shared cache (sharedcache.py). A
+# worker's first snapshot is taken from there while another worker's copy is
+# still fresh, and from an older copy (up to max_stale seconds past its
+# expiry) when its own first fetch fails, so /live does not fail just because
+# this worker has not reached Cricbuzz yet.
+
+LIVE_SCORES_URL = "https://www.cricbuzz.com/cricket-match/live-scores"
+POLL_INTERVAL = float(os.environ.get("LIVE_POLL_INTERVAL", "10"))
+STREAM_HEARTBEAT = float(os.environ.get("LIVE_STREAM_HEARTBEAT", "15"))
+STREAM_BACKLOG = int(os.environ.get("LIVE_STREAM_BACKLOG", "500"))
+# Each open stream holds a gthread worker thread; beyond this many per worker
+# new subscribers get 503 with Retry-After, leaving threads for other routes
+STREAM_MAX_SUBSCRIBERS = int(os.environ.get("LIVE_STREAM_MAX_SUBSCRIBERS", "4"))
+STREAM_RETRY_AFTER = int(os.environ.get("LIVE_STREAM_RETRY_AFTER", "30"))
+
+# Fields whose change is pushed to /live/stream subscribers
+STREAM_FIELDS = ("batting_score", "status", "details")
+
+# version increases whenever the parsed data changes; body is the ready JSON
+# (matches flagged by flag_changes), variants its compressed forms
+# (payload.compress), tag its ETag and changed the keys of the matches that
+# changed in this version
+Snapshot = namedtuple("Snapshot", "version fetched_at data body variants tag status changed")
+
+# One entry of the /live/stream change log; id is the SSE event id
+# within the worker's epoch (see format_event)
+Event = namedtuple("Event", "id kind data")
+
+
+def snapshot_age(snapshot):
+    return max(0.0, time.time() - snapshot.fetched_at)
+
+
+def _match_key(match):
+    return match.get("match_url") or match.get("title") or match.get("raw_score_text")
+
+
+def _match_map(data):
+    if not isinstance(data, list):
+        return {}
+    return {_match_key(match): match for match in data}
+
+
+def changed_keys(old_data, new_data):
+    """Keys of the matches in new_data that are new or differ in any field."""
+    old = _match_map(old_data)
+    # The parser reuses the dict of an unchanged match block, so most matches
+    # are settled by the identity check
+    return frozenset(key for key, match in _match_map(new_data).items()
+                     if old.get(key) is not match and old.get(key) != match)
+
+
+def flag_changes(data, changed):
+    """The match list with a "changed" flag on each match (data itself is left untouched)."""
+    if not isinstance(data, list):
+        return data
+    return [dict(match, changed=_match_key(match) in changed) for match in data]
+
+
+def diff_matches(old_data, new_data):
+    """Return (kind, match) pairs for matches that appeared, changed a STREAM_FIELDS value, or went away."""
+    old, new = _match_map(old_data), _match_map(new_data)
+    changes = []
+    for key, match in new.items():
+        previous = old.get(key)
+        if previous is None or (previous is not match and any(previous.get(f) != match.get(f) for f in STREAM_FIELDS)):
+            changes.append(("match", match))
+    for key, match in old.items():
+        if key not in new:
+            changes.append(("removed", match))
+    return changes
+
+
+def format_event(event, epoch):
+    """
+    The SSE text of an event. Its id is "<epoch>-<number>": numbers count
+    up per worker, and the epoch names the worker's change log, so a
+    Last-Event-ID from another worker (or an earlier run) is never mistaken
+    for a position in this one.
+    """
+    return f"id: {epoch}-{event.id}\nevent: {event.kind}\ndata: {json.dumps(event.data, sort_keys=True)}\n\n"
+
+
+class LivePoller:
+    """Keeps the latest parsed live-scores snapshot fresh with a background job."""
+
+    def __init__(self, parse, url=LIVE_SCORES_URL, interval=POLL_INTERVAL, policy=None, shared=None, max_stale=0):
+        self.parse = parse
+        self.url = url
+        self.interval = interval    # until the next poll; updated from policy(data)
+        self.policy = policy
+        self.shared = shared        # sharedcache.SharedCache, or None
+        self.max_stale = max_stale
+        self.last_error = None
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=STREAM_BACKLOG)
+        self._event_id = 0
+        self._epoch = None  # set with this worker's first snapshot
+        self._changed = threading.Condition(self._lock)
+        self.subscribers = 0
+        self.rejected = 0
+
+    def refresh(self):
+        """Fetch and parse the page now, publishing a new snapshot if the data changed."""
+        data = upstream.get_parsed(self.url, self.parse)
+        now = time.time()
+        with self._lock:
+            current = self._snapshot
+            if current is None:
+                self._epoch = uuid.uuid4().hex[:12]
+            if current is not None and (current.data is data or current.data == data):
+                # Unchanged data; only the fetch time moves
+                self._snapshot = current._replace(fetched_at=now)
+            else:
+                status = 404 if isinstance(data, dict) and "error" in data else 200
+                version = current.version + 1 if current is not None else 1
+                changed = changed_keys(current.data if current is not None else None, data)
+                with metrics.timed("serialize"):
+                    body = payload.dumps(flag_changes(data, changed))
+                with metrics.timed("compress"):
+                    variants = payload.compress(body)
+                self._snapshot = Snapshot(version, now, data, body, variants, payload.etag(body), status, changed)
+                if current is not None:
+                    for kind, match in diff_matches(current.data, data):
+                        self._event_id += 1
+                        self._events.append(Event(self._event_id, kind, match))
+                    self._changed.notify_all()
+            self.last_error = None
+            snapshot = self._snapshot
+        if self.policy is not None and snapshot.status == 200:
+            self.interval = self.policy(snapshot.data)
+        if self.shared is not None and snapshot.status == 200:
+            self.shared.put("live_poller", self.url, snapshot.body, snapshot.status, "application/json",
+                            snapshot.fetched_at, snapshot.fetched_at + self.interval, snapshot.fetched_at + self.interval)
+        return snapshot
+
+    def _seed(self, grace=0):
+        """Publish the shared cache's snapshot as this worker's first one; None if there is none within `grace`."""
+        row = self.shared.get("live_poller", self.url, grace=grace) if self.shared is not None else None
+        if row is None:
+            return None
+        body, _, _, stored_at = row[:4]
+        flagged = json.loads(body)
+        data = [{field: value for field, value in match.items() if field != "changed"} for match in flagged]
+        changed = frozenset(_match_key(match) for match in flagged if match.get("changed"))
+        body = bytes(body)
+        seeded = Snapshot(0, stored_at, data, body, payload.compress(body), payload.etag(body), 200, changed)
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = seeded
+                self._epoch = uuid.uuid4().hex[:12]
+            snapshot = self._snapshot
+        if self.policy is not None and snapshot.status == 200:
+            self.interval = self.policy(snapshot.data)
+        return snapshot
+
+    def _poll(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        return self.interval
+
+    def start(self):
+        """Schedule polling for this worker process (idempotent: the scheduler ignores a name it already runs)."""
+        scheduler.background.add("live_poller", self._poll, self.interval, priority=True)
+
+    def snapshot(self):
+        """
+        Return the current snapshot, starting the poller on first use.
+
+        The first call in a worker takes a fresh snapshot from the shared
+        cache, or else fetches synchronously. If that fetch fails it falls
+        back to a stale shared snapshot, and raises
+        requests.RequestException only if there is none.
+        """
+        self.start()
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self._seed()
+        if snapshot is None:
+            try:
+                snapshot = self.refresh()
+            except requests.RequestException as e:
+                self.last_error = str(e)
+                snapshot = self._seed(grace=self.max_stale)
+                if snapshot is None:
+                    raise
+        return snapshot
+
+    def subscribe(self, limit=STREAM_MAX_SUBSCRIBERS):
+        """Take a stream slot; False (counted as a rejection) if `limit` streams are already open."""
+        with self._lock:
+            if self.subscribers >= limit:
+                self.rejected += 1
+                return False
+            self.subscribers += 1
+            return True
+
+    def unsubscribe(self):
+        """Give back a slot taken with subscribe()."""
+        with self._lock:
+            self.subscribers -= 1
+
+    def stream(self, last_event_id=None, heartbeat=STREAM_HEARTBEAT):
+        """
+        Yield Server-Sent Events for match changes, forever.
+
+        A new subscriber first gets one `snapshot` event with the full match
+        list. A subscriber resuming with Last-Event-ID (the header's text)
+        gets the events it missed, or a fresh `snapshot` if they have already
+        left the backlog or the id is from another worker's epoch. A comment
+        line is sent every `heartbeat` seconds without changes.
+        """
+        snapshot = self.snapshot()
+        with self._lock:
+            epoch = self._epoch
+            cursor = self._event_id
+            oldest = self._events[0].id if self._events else cursor + 1
+        prefix, _, number = (last_event_id or "").rpartition("-")
+        resume = int(number) if prefix == epoch and number.isdigit() else None
+        if resume is None or not (oldest - 1 <= resume <= cursor):
+            yield format_event(Event(cursor, "snapshot", snapshot.data), epoch)
+        else:
+            cursor = resume
+
+        while True:
+            with self._changed:
+                if self._event_id == cursor:
+                    self._changed.wait(timeout=heartbeat)
+                pending = [event for event in self._events if event.id > cursor]
+            if not pending:
+                yield ": heartbeat\n\n"
+                continue
+            if pending[0].id > cursor + 1:
+                # Fell behind the backlog; resynchronise with the full list
+                yield format_event(Event(pending[-1].id, "snapshot", self._snapshot.data), epoch)
+                cursor = pending[-1].id
+                continue
+            for event in pending:
+                yield format_event(event, epoch)
+            cursor = pending[-1].id
@@ -1,19 +1,60 @@
 from flask import Flask, jsonify, render_template, request # Added request
 import requests
-from bs4 import BeautifulSoup
 import re
 from flask_cors import CORS
 from datetime import datetime, timedelta, timezone
 import pytz
 import time
 import logging # Added logging
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+import payload
+import cache
+import scheduler
+import upstream
+from extract import parse_html, xpath, has_class, class_is, first, text, FragmentCache
+from cache import cached, set_ttl
+from live import LivePoller, snapshot_age, flag_changes, STREAM_RETRY_AFTER
+from players import PlayerIndex, parse_profile_url
+from archive import ScorecardArchive
+from query import Query
+from series import SeriesCatalogue, SEARCH_LIMIT
+from standings import PointsTables
+from schedules import ScheduleStore, SCHEDULE_SERIES, parse_bound
+from players import normalize as normalize_name
 
 app = Flask(__name__)
 CORS(app)
+metrics.init_app(app)
+payload.init_app(app)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO) # Log INFO level and above
 
+# Response cache TTLs (seconds) per route
+CACHE_DURATION = 3600  # Cache for 1 hour
+PLAYER_CACHE_TTL = 6 * 3600
+SCHEDULE_CACHE_TTL = 900
+SCORECARD_CACHE_TTL = 60
+SERIES_CACHE_TTL = CACHE_DURATION
+IPL_SCHEDULE_CACHE_TTL = 300
+# Routes showing match states (/live, /ipl-schedule, /scrape/scorecard) set
+# their own TTLs from those states; see scheduler.interval_for
+POINTS_TABLE_CACHE_TTL = 60  # tables themselves are refetched per standings.py TTLs
+ARCHIVE_MAX_AGE = 24 * 3600  # Cache-Control for archived scorecards, which never change
+
+# Live-score match blocks remembered for incremental re-parsing
+LIVE_FRAGMENT_CACHE_SIZE = int(os.environ.get("LIVE_FRAGMENT_CACHE_SIZE", "256"))
+
+# /players batch lookups
+PLAYER_BATCH_MAX = int(os.environ.get("PLAYER_BATCH_MAX", "50"))
+PLAYER_BATCH_WORKERS = int(os.environ.get("PLAYER_BATCH_WORKERS", "8"))
+# Batch lookups have no cached response to fall back on, so they wait this
+# long for an upstream rate-limit token instead of failing fast
+PLAYER_BATCH_RATE_WAIT = float(os.environ.get("PLAYER_BATCH_RATE_WAIT", "15"))
+
 if __name__ == "__main__":
     # Run with debug=True FOR DEVELOPMENT ONLY.
     app.run(host='0.0.0.0', port=8080, debug=True)
@@ -33,811 +74,1182 @@ def index():
     endpoints.sort(key=lambda x: x['url'])
     return render_template('index.html', endpoints=endpoints)
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Request, stage, cache and upstream metrics in Prometheus text format (this worker only)"""
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+_FIRST_LINK = xpath("(.//a)[1]")
+_SEARCH_RESULT = xpath(f"(//div[{has_class('kCrYT')}])[1]")
+
+def parse_player_search(html):
+    """Extract the Cricbuzz profile URL from a Google search results page, or None."""
+    page = parse_html(html)
+    page_link_element = first(_SEARCH_RESULT, page)
+    page_link = first(_FIRST_LINK, page_link_element) if page_link_element is not None else None
+    if page_link is None:
+        return None
+    link_suffix = page_link.attrib["href"]
+    profile = parse_profile_url(link_suffix)
+    if profile is not None:
+        return profile[1]
+    return f"https://www.cricbuzz.com{link_suffix[6:]}"
+
+_PROFILE = xpath("(//div[@id='playerProfile'])[1]")
+_PROFILE_INFO = xpath(f"(.//div[{class_is('cb-col-100 cb-bg-white')}])[1]")
+_PROFILE_NAME = xpath(f"(.//h1[{has_class('cb-font-40')}])[1]")
+_PROFILE_COUNTRY = xpath(f"(.//h3[{class_is('cb-font-18 text-gray')}])[1]")
+_PROFILE_IMAGE = xpath("(.//img)[1]")
+_PERSONAL_INFO = xpath(f"//div[{class_is('cb-col cb-col-60 cb-lst-itm-sm')}]")
+_ICC_RANKINGS = xpath(f"//div[{class_is('cb-col cb-col-25 cb-plyr-rank text-right')}]")
+_SUMMARY_TABLES = xpath(f"//div[{has_class('cb-plyr-tbl')}]")
+_SUMMARY_CATEGORIES = xpath(f".//td[{has_class('cb-col-8')}]")
+_SUMMARY_STATS = xpath(f".//td[{has_class('text-right')}]")
+
+def parse_player_profile(html):
+    """Parse a Cricbuzz player profile page into the /players response dict."""
+    root = parse_html(html)
+
+    profile = first(_PROFILE, root)
+    if profile is None:
+        return {"error": "Could not find player profile section on Cricbuzz"}
+    pc = first(_PROFILE_INFO, profile)
+    if pc is None:
+        return {"error": "Could not find player info container"}
+
+    name_element = first(_PROFILE_NAME, pc)
+    name = text(name_element).strip() if name_element is not None else "N/A"
+    country_element = first(_PROFILE_COUNTRY, pc)
+    country = text(country_element).strip() if country_element is not None else "N/A"
+    image_element = first(_PROFILE_IMAGE, pc)
+    image_src = image_element.get('src', "N/A") if image_element is not None else "N/A"
+
+    personal_info = _PERSONAL_INFO(root)
+    role = text(personal_info[2]).strip() if len(personal_info) > 2 else "N/A"
+    icc_rankings = _ICC_RANKINGS(root)
+
+    rankings = {}
+    rank_categories = ["Test Batting", "ODI Batting", "T20 Batting", "Test Bowling", "ODI Bowling", "T20 Bowling"]
+    for i, category in enumerate(rank_categories):
+        rankings[category] = text(icc_rankings[i]).strip() if len(icc_rankings) > i else "N/A"
+
+    summary_tables = _SUMMARY_TABLES(root)
+    career_summary = []
+    if len(summary_tables) >= 2:
+        batting_table = summary_tables[0]
+        bowling_table = summary_tables[1]
+        categories = [text(td) for td in _SUMMARY_CATEGORIES(batting_table)[:3]]
+
+        batting_stats = [text(td) for td in _SUMMARY_STATS(batting_table)]
+        batting_formats = ["Test", "ODI", "T20"]
+        batting_career = []
+        for i, format_name in enumerate(batting_formats):
+            start_index = i * 13
+            if len(batting_stats) > start_index + 12:
+                batting_career.append({
+                    "Format": categories[i] if len(categories) > i else format_name,
+                    "Matches": batting_stats[start_index + 0], "Runs": batting_stats[start_index + 3],
+                    "HS": batting_stats[start_index + 4], "Avg": batting_stats[start_index + 5],
+                    "SR": batting_stats[start_index + 7], "100s": batting_stats[start_index + 8], "50s": batting_stats[start_index + 10]
+                })
+            else:
+                batting_career.append({"Format": categories[i] if len(categories) > i else format_name, "Matches": "N/A", "Runs": "N/A", "HS": "N/A", "Avg": "N/A", "SR": "N/A", "100s": "N/A", "50s": "N/A"})
+
+        bowling_stats = [text(td) for td in _SUMMARY_STATS(bowling_table)]
+        bowling_formats = ["Test", "ODI", "T20"]
+        bowling_career = []
+        for i, format_name in enumerate(bowling_formats):
+            start_index = i * 13
+            if len(bowling_stats) > start_index + 12:
+                bowling_career.append({
+                    "Format": categories[i] if len(categories) > i else format_name,
+                    "Balls": bowling_stats[start_index + 2], "Runs Conceded": bowling_stats[start_index + 3],
+                    "Wickets": bowling_stats[start_index + 4], "BBI": bowling_stats[start_index + 5], "BBM": bowling_stats[start_index + 6],
+                    "Economy": bowling_stats[start_index + 7], "5W": bowling_stats[start_index + 10]
+                })
+            else:
+                bowling_career.append({"Format": categories[i] if len(categories) > i else format_name, "Balls": "N/A", "Runs Conceded": "N/A", "Wickets": "N/A", "BBI": "N/A", "BBM": "N/A", "Economy": "N/A", "5W": "N/A"})
+
+
+        career_summary = {
+            "Batting Career Summary": batting_career,
+            "Bowling Career Summary": bowling_career
+        }
+
+    player_data = {
+        "Player Name": name,
+        "Country": country,
+        "Role": role,
+        "Image Source": image_src,
+        "Rankings": rankings,
+        **career_summary
+    }
+    return player_data
+
+player_index = PlayerIndex()
+player_pool = ThreadPoolExecutor(max_workers=PLAYER_BATCH_WORKERS, thread_name_prefix="player")
+
+def resolve_player_url(player_name, rate_wait=None):
+    """
+    (Cricbuzz profile URL, whether it came from a search) for a player name:
+    from the local index, else via Google search (URL None if not found).
+    """
+    indexed = player_index.lookup(player_name)
+    if indexed is not None:
+        return indexed["url"], False
+    # Google serves the simple kCrYT markup only to non-browser clients, so skip the browser User-Agent
+    url = upstream.get_parsed(f"https://www.google.com/search?q={player_name}%20cricbuzz", parse_player_search, headers={},
+                              rate_wait=rate_wait)
+    return url, True
+
+def fetch_player(player_name, rate_wait=None):
+    """
+    Resolve and scrape one player's profile; returns (response dict, HTTP
+    status). rate_wait is passed on to upstream.get_parsed.
+    """
+    try:
+        player_url, searched = resolve_player_url(player_name, rate_wait)
+        if not player_url:
+            return {"error": "Could not find player link from Google search"}, 404
+
+        # A profile fetched within the player TTL is reused as-is, by single and batch lookups alike
+        player_data = upstream.get_parsed(player_url, parse_player_profile, max_age=PLAYER_CACHE_TTL, rate_wait=rate_wait)
+        if "error" in player_data:
+            return player_data, 404
+        # The query becomes an alias only when a search found the profile for it;
+        # an index hit may have been a prefix or typo match
+        aliases = [player_name] if searched else []
+        player_index.add(player_url, *aliases, *[n for n in [player_data["Player Name"]] if n != "N/A"])
+        return player_data, 200
+
+    except requests.RequestException as e:
+        return {"error": f"Failed to fetch player data: {str(e)}"}, 500
+    except Exception as e:
+        return {"error": f"An unexpected error occurred: {str(e)}"}, 500
+
 @app.route('/players/<player_name>', methods=['GET'])
+@cached(ttl=PLAYER_CACHE_TTL)
 def get_player(player_name):
     """Get player information"""
-    try:
-        source = requests.get(f"https://www.google.com/search?q={player_name}%20cricbuzz").text
-        page = BeautifulSoup(source, "lxml")
-        page_link_element = page.find("div", class_="kCrYT")
-        if not page_link_element or not page_link_element.find("a"):
-            return jsonify({"error": "Could not find player link from Google search"}), 404
-        link_suffix = page_link_element.find("a")["href"]
-        player_url = f"https://www.cricbuzz.com{link_suffix[6:]}"
-
-        cricbuzz_page = requests.get(player_url).text
-        cricbuzz_soup = BeautifulSoup(cricbuzz_page, "lxml")
-
-        profile = cricbuzz_soup.find("div", id="playerProfile")
-        if not profile:
-            return jsonify({"error": "Could not find player profile section on Cricbuzz"}), 404
-        pc = profile.find("div", class_="cb-col-100 cb-bg-white")
-        if not pc:
-            return jsonify({"error": "Could not find player info container"}), 404
-
-        name_element = pc.find("h1", class_="cb-font-40")
-        name = name_element.text.strip() if name_element else "N/A"
-        country_element = pc.find("h3", class_="cb-font-18 text-gray")
-        country = country_element.text.strip() if country_element else "N/A"
-        image_element = pc.find('img')
-        image_src = image_element['src'] if image_element and 'src' in image_element.attrs else "N/A"
-
-        personal_info = cricbuzz_soup.find_all("div", class_="cb-col cb-col-60 cb-lst-itm-sm")
-        role = personal_info[2].text.strip() if len(personal_info) > 2 else "N/A"
-        icc_rankings = cricbuzz_soup.find_all("div", class_="cb-col cb-col-25 cb-plyr-rank text-right")
-
-        rankings = {}
-        rank_categories = ["Test Batting", "ODI Batting", "T20 Batting", "Test Bowling", "ODI Bowling", "T20 Bowling"]
-        for i, category in enumerate(rank_categories):
-            rankings[category] = icc_rankings[i].text.strip() if len(icc_rankings) > i else "N/A"
-
-        summary_tables = cricbuzz_soup.find_all("div", class_="cb-plyr-tbl")
-        career_summary = []
-        if len(summary_tables) >= 2:
-            batting_table = summary_tables[0]
-            bowling_table = summary_tables[1]
-            categories = [td.text for td in batting_table.find_all("td", class_="cb-col-8")[:3]]
-
-            batting_stats = batting_table.find_all("td", class_="text-right")
-            batting_formats = ["Test", "ODI", "T20"]
-            batting_career = []
-            for i, format_name in enumerate(batting_formats):
-                start_index = i * 13
-                if len(batting_stats) > start_index + 12:
-                    batting_career.append({
-                        "Format": categories[i] if len(categories) > i else format_name,
-                        "Matches": batting_stats[start_index + 0].text, "Runs": batting_stats[start_index + 3].text,
-                        "HS": batting_stats[start_index + 4].text, "Avg": batting_stats[start_index + 5].text,
-                        "SR": batting_stats[start_index + 7].text, "100s": batting_stats[start_index + 8].text, "50s": batting_stats[start_index + 10].text
-                    })
-                else:
-                    batting_career.append({"Format": categories[i] if len(categories) > i else format_name, "Matches": "N/A", "Runs": "N/A", "HS": "N/A", "Avg": "N/A", "SR": "N/A", "100s": "N/A", "50s": "N/A"})
-
-            bowling_stats = bowling_table.find_all("td", class_="text-right")
-            bowling_formats = ["Test", "ODI", "T20"]
-            bowling_career = []
-            for i, format_name in enumerate(bowling_formats):
-                start_index = i * 13
-                if len(bowling_stats) > start_index + 12:
-                    bowling_career.append({
-                        "Format": categories[i] if len(categories) > i else format_name,
-                        "Balls": bowling_stats[start_index + 2].text, "Runs Conceded": bowling_stats[start_index + 3].text,
-                        "Wickets": bowling_stats[start_index + 4].text, "BBI": bowling_stats[start_index + 5].text, "BBM": bowling_stats[start_index + 6].text,
-                        "Economy": bowling_stats[start_index + 7].text, "5W": bowling_stats[start_index + 10].text
-                    })
-                else:
-                    bowling_career.append({"Format": categories[i] if len(categories) > i else format_name, "Balls": "N/A", "Runs Conceded": "N/A", "Wickets": "N/A", "BBI": "N/A", "BBM": "N/A", "Economy": "N/A", "5W": "N/A"})
+    data, status = fetch_player(player_name)
+    return jsonify(data), status
+
+@app.route('/players', methods=['GET', 'POST'])
+def get_players():
+    """Get several players at once (?names=a,b,c or POST {"names": [...]})"""
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        names = body.get('names') if isinstance(body, dict) else None
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            return jsonify({"error": "POST body must be a JSON object like {\"names\": [\"name\", ...]}"}), 400
+    else:
+        names = request.args.get('names', '').split(',')
+
+    # Drop blanks and repeats, keeping the requested order
+    names = list(dict.fromkeys(name.strip() for name in names if name.strip()))
+    if not names:
+        return jsonify({"error": "Missing player names; use ?names=a,b,c"}), 400
+    if len(names) > PLAYER_BATCH_MAX:
+        return jsonify({"error": f"Too many players requested (max {PLAYER_BATCH_MAX})"}), 400
+
+    # Profiles are fetched concurrently on a pool shared by all batch requests,
+    # paced by the upstream rate limit rather than refused by it. Each task's
+    # stages are timed under this request
+    collection = metrics.current()
+
+    def fetch(name):
+        with metrics.joined(collection):
+            return fetch_player(name, PLAYER_BATCH_RATE_WAIT)
+
+    players = []
+    results = player_pool.map(fetch, names)
+    for name, (data, status) in zip(names, results):
+        if status == 200:
+            players.append({"name": name, "status": status, "data": data})
+        else:
+            players.append({"name": name, "status": status, "error": data["error"]})
+    return jsonify({"players": players})
 
 
-            career_summary = {
-                "Batting Career Summary": batting_career,
-                "Bowling Career Summary": bowling_career
-            }
+_SCHEDULE_TABS = xpath(f"(//div[{has_class('cb-sched-tabs')}])[1]")
+_SCHEDULE_SECTIONS = xpath(f".//div[{class_is('cb-col-100 cb-col cb-sch-lst')}]")
+_SCHEDULE_DAY_HEADER = xpath(f"preceding::h2[{has_class('cb-sch-day-header')}][1]")
+_SCHEDULE_ITEMS = xpath(f".//div[{class_is('cb-col-100 cb-col')}]")
 
-        player_data = {
-            "Player Name": name,
-            "Country": country,
-            "Role": role,
-            "Image Source": image_src,
-            "Rankings": rankings,
-            **career_summary
-        }
-        return jsonify(player_data)
+def parse_schedule(html):
+    """Parse the upcoming international schedule page."""
+    root = parse_html(html)
 
-    except requests.RequestException as e:
-        return jsonify({"error": f"Failed to fetch player data: {str(e)}"}), 500
-    except Exception as e:
-        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+    schedule_div = first(_SCHEDULE_TABS, root)
+    if schedule_div is None:
+        return {"error": "Could not find schedule section"}
+
+    match_sections = _SCHEDULE_SECTIONS(schedule_div)
+    if not match_sections:
+        return {"error": "No match sections found"}
+
+    matches = []
+    for section in match_sections:
+        date_header = first(_SCHEDULE_DAY_HEADER, section)
+        date = text(date_header).strip() if date_header is not None else "Unknown Date"
+
+        for match_item in _SCHEDULE_ITEMS(section):
+            match_text = text(match_item).strip()
+            if not match_text:
+                continue
+            if date != "Unknown Date":
+                matches.append({
+                    "date": date,
+                    "match_details": match_text
+                })
+            else:
+                matches.append(match_text)
+
+    return matches
 
+def _schedule_text(match):
+    return match["match_details"] if isinstance(match, dict) else match
 
 @app.route('/schedule')
+@cached(ttl=SCHEDULE_CACHE_TTL)
 def schedule():
-    """Get upcoming match schedules"""
+    """Get upcoming match schedules (?team=, ?fields=, ?limit=, ?offset=)"""
+    try:
+        query = Query.from_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     try:
         schedule_url = "https://www.cricbuzz.com/cricket-schedule/upcoming-series/international"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(schedule_url, headers=headers)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'lxml')
-
-        schedule_div = soup.find('div', class_='cb-sched-tabs')
-        if not schedule_div:
-            return jsonify({"error": "Could not find schedule section"}), 404
-
-        match_sections = schedule_div.find_all('div', class_='cb-col-100 cb-col cb-sch-lst')
-        if not match_sections:
-            return jsonify({"error": "No match sections found"}), 404
-
-        matches = []
-        for section in match_sections:
-            date_header = section.find_previous('h2', class_='cb-sch-day-header')
-            date = date_header.text.strip() if date_header else "Unknown Date"
-
-            match_items = section.find_all('div', class_='cb-col-100 cb-col')
-            for match_item in match_items:
-                if not match_item.text.strip():
-                    continue
-                match_text = match_item.text.strip()
-                if date != "Unknown Date":
-                    matches.append({
-                        "date": date,
-                        "match_details": match_text
-                    })
-                else:
-                    matches.append(match_text)
-
-        return jsonify(matches)
+        matches = upstream.get_parsed(schedule_url, parse_schedule)
+        if isinstance(matches, dict) and "error" in matches:
+            return jsonify(matches), 404
+        return jsonify(query.apply(matches, teams=lambda match: (_schedule_text(match),)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     except requests.RequestException as e:
         return jsonify({"error": f"Failed to fetch schedule: {str(e)}"}), 500
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
+_LIVE_SERIES_BLOCKS = xpath(f"//div[{has_class('cb-plyr-tbody')} and {has_class('cb-lv-main')}]")
+_LIVE_FALLBACK_CONTAINER = xpath(f"(//div[{class_is('cb-col cb-col-100 cb-bg-white')}])[1]")
+_LIVE_FALLBACK_SCORES = xpath(f".//div[{class_is('cb-scr-wll-chvrn cb-lv-scrs-col')}]")
+_LIVE_SERIES_NAME = xpath(f"(.//h2[{has_class('cb-lv-grn-strip')}])[1]")
+_LIVE_MATCH_ITEMS = xpath(f".//div[{class_is('cb-mtch-lst cb-col cb-col-100 cb-tms-itm')}]")
+_LIVE_TITLE_LINK = xpath(f"(.//a[{has_class('text-hvr-underline')}])[1]")
+_LIVE_TITLE_HEADER = xpath(f"(.//h3[{has_class('cb-lv-scr-mtch-hdr')}])[1]")
+_LIVE_DESCRIPTION = xpath(f"following-sibling::span[{has_class('text-gray')}][1]")
+_LIVE_DETAILS = xpath(f"following-sibling::div[{has_class('text-gray')}][1]")
+_LIVE_SCORE_LINK = xpath(f"(.//a[{has_class('cb-lv-scrs-well-live')}])[1]")
+_LIVE_BAT_TEAM = xpath(f"(.//div[{has_class('cb-hmscg-bat-txt')}])[1]")
+_LIVE_BOWL_TEAM = xpath(f"(.//div[{has_class('cb-hmscg-bwl-txt')}])[1]")
+_LIVE_TEAM_NAME = xpath(f"(.//div[{has_class('cb-hmscg-tm-nm')}])[1]")
+_LIVE_TEAM_SCORE = xpath("(.//div[contains(@style, 'width')])[1]")
+_LIVE_STATUS = xpath(f"(.//div[{has_class('cb-text-live')}])[1]")
+_LIVE_NAV = xpath(f"(.//nav[{class_is('cb-col-100 cb-col padt5')}])[1]")
+_LIVE_NAV_LINKS = xpath(f".//a[{has_class('cb-text-link')}]")
+_CHILD_ELEMENTS = xpath("./*")
+
+def _live_header_details(match_data, title_h3):
+    # Description and details are the siblings that follow the title <h3>
+    match_desc_elem = first(_LIVE_DESCRIPTION, title_h3)
+    if match_desc_elem is not None:
+        match_data['description'] = text(match_desc_elem).strip()
+    details_div = first(_LIVE_DETAILS, title_h3)
+    if details_div is not None:
+        details_text = ' '.join(text(span).strip() for span in _CHILD_ELEMENTS(details_div) if text(span).strip())
+        details_text = re.sub(r'\s+•\s+', ' • ', details_text) # Standardize separators
+        match_data['details'] = details_text.strip()
+
+# Live match blocks already extracted, by fragment fingerprint
+live_fragments = FragmentCache(maxsize=LIVE_FRAGMENT_CACHE_SIZE)
+
+def _parse_live_match(match_item, series_name):
+    """Extract one match block of the live-scores page."""
+    match_data = {"series": series_name}
+
+    # --- Header Info ---
+    # Try finding the specific title link <a> first
+    title_link_elem = first(_LIVE_TITLE_LINK, match_item)
+    if title_link_elem is not None:
+        title_href = title_link_elem.get('href')
+        match_data['title'] = text(title_link_elem).strip().rstrip(',')
+        match_data['match_url'] = "https://www.cricbuzz.com" + title_href if title_href is not None and title_href.startswith('/') else title_href
+
+        # Navigate up to find siblings for description and details
+        title_h3 = title_link_elem.getparent() # Assuming <a> is direct child of <h3>
+        if title_h3 is not None and title_h3.tag == 'h3' and title_h3.getparent() is not None:
+            _live_header_details(match_data, title_h3)
+    else:
+        # Fallback: Try finding h3 directly again, just in case
+        title_h3_fallback = first(_LIVE_TITLE_HEADER, match_item)
+        title_link = first(_FIRST_LINK, title_h3_fallback) if title_h3_fallback is not None else None
+        if title_link is not None:
+            title_href = title_link.get('href')
+            match_data['title'] = text(title_link).strip().rstrip(',')
+            match_data['match_url'] = "https://www.cricbuzz.com" + title_href if title_href is not None and title_href.startswith('/') else title_href
+            if title_h3_fallback.getparent() is not None:
+                _live_header_details(match_data, title_h3_fallback)
+
+
+    # --- Score Info ---
+    score_link_elem = first(_LIVE_SCORE_LINK, match_item)
+    if score_link_elem is not None:
+        # Add the main score link itself
+        score_href = score_link_elem.get('href')
+        if score_href:
+             match_data['score_url'] = "https://www.cricbuzz.com" + score_href if score_href.startswith('/') else score_href
+
+        bat_team_elem = first(_LIVE_BAT_TEAM, score_link_elem)
+        if bat_team_elem is not None:
+            bat_name = first(_LIVE_TEAM_NAME, bat_team_elem)
+            bat_score = first(_LIVE_TEAM_SCORE, bat_team_elem)
+            match_data['batting_team'] = text(bat_name).strip() if bat_name is not None else None
+            match_data['batting_score'] = text(bat_score).strip() if bat_score is not None else None
+
+        bowl_team_elem = first(_LIVE_BOWL_TEAM, score_link_elem)
+        if bowl_team_elem is not None:
+             bowl_name = first(_LIVE_TEAM_NAME, bowl_team_elem)
+             match_data['bowling_team'] = text(bowl_name).strip() if bowl_name is not None else None
+             # Bowling score div exists but is usually empty in the live summary
+
+        status_elem = first(_LIVE_STATUS, score_link_elem)
+        match_data['status'] = text(status_elem).strip() if status_elem is not None else None
+
+    # --- Links ---
+    nav_elem = first(_LIVE_NAV, match_item)
+    if nav_elem is not None:
+        links = {}
+        for link_elem in _LIVE_NAV_LINKS(nav_elem):
+            title = link_elem.get('title', text(link_elem).strip())
+            href = link_elem.get('href')
+            if title and href:
+                # Ensure URL is absolute
+                abs_href = href if href.startswith('http') else "https://www.cricbuzz.com" + href
+                links[title.replace(' ', '_').lower()] = abs_href
+        match_data['links'] = links
+
+    return match_data
+
+def parse_live_matches(html):
+    """Parse the live-scores page into a list of per-match dicts."""
+    root = parse_html(html)
+
+    live_matches_data = []
+    # Find all series blocks which contain match items
+    series_blocks = _LIVE_SERIES_BLOCKS(root)
+
+    if not series_blocks:
+         # Fallback or alternative structure check if needed, or return error
+         # Let's try the original simple extraction as a fallback
+         live_score_div = first(_LIVE_FALLBACK_CONTAINER, root)
+         if live_score_div is not None:
+             for match_div in _LIVE_FALLBACK_SCORES(live_score_div):
+                 score_text = text(match_div).strip()
+                 if score_text:
+                     live_matches_data.append({"raw_score_text": score_text})
+             if live_matches_data:
+                 return live_matches_data
+         # If fallback also fails
+         return {"error": "Could not find any live match sections using known structures"}
+
+    for series_block in series_blocks:
+        series_name_elem = first(_LIVE_SERIES_NAME, series_block)
+        series_link = first(_FIRST_LINK, series_name_elem) if series_name_elem is not None else None
+        series_name = text(series_link).strip() if series_link is not None else "Unknown Series"
+
+        for match_item in _LIVE_MATCH_ITEMS(series_block):
+            # Unchanged match blocks reuse the dict extracted on an earlier poll
+            match_data = live_fragments.extract(match_item, _parse_live_match, series_name)
+            if match_data.get('title'): # Only add if we found at least a title
+                live_matches_data.append(match_data)
+
+    return live_matches_data
+
+def live_match_state(match):
+    """live, upcoming or completed for a /live match: the live-scores page only shows a status line for live matches."""
+    if match.get('status'):
+        return "live"
+    return "completed" if match.get('batting_score') else "upcoming"
+
+def _live_teams(match):
+    return (match.get('title'), match.get('batting_team'), match.get('bowling_team'))
+
+def live_poll_interval(matches):
+    """
+    Seconds until the next live-scores poll: every few seconds while a match is
+    in progress. The page only lists today's fixtures, so an upcoming one is
+    taken to start soon, and a page of results is still checked every
+    DEFAULT_INTERVAL for new matches.
+    """
+    now = datetime.now(timezone.utc)
+    interval = scheduler.interval_for(((live_match_state(match), now) for match in matches), now)
+    return min(interval, scheduler.DEFAULT_INTERVAL)
+
+# Background poller that keeps /live's snapshot fresh
+live_poller = LivePoller(parse_live_matches, policy=live_poll_interval, shared=cache.shared, max_stale=cache.STALE_IF_ERROR)
+
 @app.route('/live')
 def live_matches():
-    """Get live match scores summary"""
+    """Get live match scores summary (?status=, ?team=, ?category= (series), ?fields=, ?limit=, ?offset=)"""
     try:
-        link = "https://www.cricbuzz.com/cricket-match/live-scores"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(link, headers=headers)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'lxml')
-
-        live_matches_data = []
-        # Find all series blocks which contain match items
-        series_blocks = soup.find_all("div", class_=lambda x: x and 'cb-plyr-tbody' in x.split() and 'cb-lv-main' in x.split())
-
-        if not series_blocks:
-             # Fallback or alternative structure check if needed, or return error
-             # Let's try the original simple extraction as a fallback
-             live_score_div = soup.find("div", class_="cb-col cb-col-100 cb-bg-white")
-             if live_score_div:
-                 matches_divs = live_score_div.find_all("div", class_="cb-scr-wll-chvrn cb-lv-scrs-col")
-                 for match_div in matches_divs:
-                     if match_div.text.strip():
-                         live_matches_data.append({"raw_score_text": match_div.text.strip()})
-                 if live_matches_data:
-                     return jsonify(live_matches_data)
-             # If fallback also fails
-             return jsonify({"error": "Could not find any live match sections using known structures"}), 404
-
-        for series_block in series_blocks:
-            series_name_elem = series_block.find('h2', class_='cb-lv-grn-strip')
-            series_name = series_name_elem.a.text.strip() if series_name_elem and series_name_elem.a else "Unknown Series"
-
-            match_items = series_block.find_all('div', class_='cb-mtch-lst cb-col cb-col-100 cb-tms-itm')
-
-            for match_item in match_items:
-                match_data = {"series": series_name}
-
-                # --- Header Info ---
-                # Try finding the specific title link <a> first
-                title_link_elem = match_item.find('a', class_='text-hvr-underline') # Using class from snippet
-                if title_link_elem:
-                    match_data['title'] = title_link_elem.text.strip().rstrip(',')
-                    match_data['match_url'] = "https://www.cricbuzz.com" + title_link_elem['href'] if title_link_elem.has_attr('href') and title_link_elem['href'].startswith('/') else title_link_elem.get('href')
-
-                    # Navigate up to find siblings for description and details
-                    title_h3 = title_link_elem.parent # Assuming <a> is direct child of <h3>
-                    if title_h3 and title_h3.name == 'h3':
-                        header_container = title_h3.parent # Assuming <h3> is direct child of the container div
-                        if header_container:
-                            match_desc_elem = title_h3.find_next_sibling('span', class_='text-gray')
-                            if match_desc_elem:
-                                match_data['description'] = match_desc_elem.text.strip()
-
-                            details_div = title_h3.find_next_sibling('div', class_='text-gray')
-                            if details_div:
-                                 details_text = ' '.join(span.text.strip() for span in details_div.find_all(recursive=False) if span.text.strip())
-                                 details_text = re.sub(r'\s+•\s+', ' • ', details_text) # Standardize separators
-                                 match_data['details'] = details_text.strip()
-                else:
-                    # Fallback: Try finding h3 directly again, just in case
-                    title_h3_fallback = match_item.find('h3', class_='cb-lv-scr-mtch-hdr')
-                    if title_h3_fallback and title_h3_fallback.a:
-                         match_data['title'] = title_h3_fallback.a.text.strip().rstrip(',')
-                         match_data['match_url'] = "https://www.cricbuzz.com" + title_h3_fallback.a['href'] if title_h3_fallback.a.has_attr('href') and title_h3_fallback.a['href'].startswith('/') else title_h3_fallback.a.get('href')
-                         # Try finding siblings again
-                         header_container = title_h3_fallback.parent
-                         if header_container:
-                            match_desc_elem = title_h3_fallback.find_next_sibling('span', class_='text-gray')
-                            if match_desc_elem:
-                                match_data['description'] = match_desc_elem.text.strip()
-                            details_div = title_h3_fallback.find_next_sibling('div', class_='text-gray')
-                            if details_div:
-                                 details_text = ' '.join(span.text.strip() for span in details_div.find_all(recursive=False) if span.text.strip())
-                                 details_text = re.sub(r'\s+•\s+', ' • ', details_text) # Standardize separators
-                                 match_data['details'] = details_text.strip()
-
-
-                # --- Score Info ---
-                score_link_elem = match_item.find('a', class_='cb-lv-scrs-well-live')
-                if score_link_elem:
-                    # Add the main score link itself
-                    score_href = score_link_elem.get('href')
-                    if score_href:
-                         match_data['score_url'] = "https://www.cricbuzz.com" + score_href if score_href.startswith('/') else score_href
-
-                    bat_team_elem = score_link_elem.find('div', class_='cb-hmscg-bat-txt')
-                    if bat_team_elem:
-                        bat_name = bat_team_elem.find('div', class_='cb-hmscg-tm-nm')
-                        bat_score = bat_team_elem.find('div', style=lambda value: value and 'width' in value)
-                        match_data['batting_team'] = bat_name.text.strip() if bat_name else None
-                        match_data['batting_score'] = bat_score.text.strip() if bat_score else None
-
-                    bowl_team_elem = score_link_elem.find('div', class_='cb-hmscg-bwl-txt')
-                    if bowl_team_elem:
-                         bowl_name = bowl_team_elem.find('div', class_='cb-hmscg-tm-nm')
-                         match_data['bowling_team'] = bowl_name.text.strip() if bowl_name else None
-                         # Bowling score div exists but is usually empty in the live summary
-
-                    status_elem = score_link_elem.find('div', class_='cb-text-live')
-                    match_data['status'] = status_elem.text.strip() if status_elem else None
-
-                # --- Links ---
-                nav_elem = match_item.find('nav', class_='cb-col-100 cb-col padt5')
-                if nav_elem:
-                    links = {}
-                    for link_elem in nav_elem.find_all('a', class_='cb-text-link'):
-                        title = link_elem.get('title', link_elem.text.strip())
-                        href = link_elem.get('href')
-                        if title and href:
-                            # Ensure URL is absolute
-                            abs_href = href if href.startswith('http') else "https://www.cricbuzz.com" + href
-                            links[title.replace(' ', '_').lower()] = abs_href
-                    match_data['links'] = links
-
-                if match_data.get('title'): # Only add if we found at least a title
-                    live_matches_data.append(match_data)
-
-        return jsonify(live_matches_data)
-
+        query = Query.from_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        snapshot = live_poller.snapshot()
     except requests.RequestException as e:
         return jsonify({"error": f"Failed to fetch live scores: {str(e)}"}), 500
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
+    if query and snapshot.status == 200:
+        # Filtered views are serialized per request; the full list stays pre-serialized
+        try:
+            response = jsonify(query.apply(flag_changes(snapshot.data, snapshot.changed), status=live_match_state,
+                                           teams=_live_teams, category=lambda match: match.get('series')))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    else:
+        response = payload.respond(snapshot.body, snapshot.variants, snapshot.status, tag=snapshot.tag)
+    # Fresh until the next poll
+    response.cache_control.max_age = max(0, int(live_poller.interval - snapshot_age(snapshot)))
+    response.headers['X-Snapshot-Version'] = str(snapshot.version)
+    response.headers['X-Snapshot-Age'] = f"{snapshot_age(snapshot):.3f}"
+    if live_poller.last_error is not None:
+        # The latest poll failed, so this is the last good snapshot
+        response.headers['X-Stale-Age'] = str(int(snapshot_age(snapshot)))
+    return response
+
+def _live_metric_lines():
+    snapshot = live_poller._snapshot
+    if snapshot is None:
+        return []
+    return (
+        metrics.family("live_snapshot_version", "gauge", "Version of the current /live snapshot.", (), [((), snapshot.version)])
+        + metrics.family("live_snapshot_age_seconds", "gauge", "Seconds since the last successful live-scores poll.", (), [((), round(snapshot_age(snapshot), 3))])
+        + metrics.family("live_stream_subscribers", "gauge", "Open /live/stream connections.", (), [((), live_poller.subscribers)])
+        + metrics.family("live_stream_rejected_total", "counter", "/live/stream connections refused at the subscriber cap.", (), [((), live_poller.rejected)])
+    )
+
+metrics.add_collector(_live_metric_lines)
+
+@app.route('/live/stream')
+def live_stream():
+    """Stream live score changes as Server-Sent Events (resume with Last-Event-ID)"""
+    try:
+        live_poller.snapshot()
+    except requests.RequestException as e:
+        return jsonify({"error": f"Failed to fetch live scores: {str(e)}"}), 500
+
+    # Each stream holds a worker thread until the client goes away, so only a
+    # few are let in per worker
+    if not live_poller.subscribe():
+        response = jsonify({"error": "Too many live streams open, retry later or poll /live"})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(STREAM_RETRY_AFTER)
+        return response
+
+    last_event_id = request.headers.get('Last-Event-ID')
+    response = app.response_class(live_poller.stream(last_event_id), mimetype='text/event-stream')
+    response.call_on_close(live_poller.unsubscribe)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # let proxies pass events through unbuffered
+    return response
+
+_SCORECARD_STATUS = xpath(f"(//div[{has_class('cb-text-complete')}])[1]")
+_SCORECARD_INNINGS = xpath("//div[starts-with(@id, 'innings_')]")
+_SCORECARD_ROWS_DEEP = xpath(f".//div[{class_is('cb-col cb-col-100 cb-scrd-itms')}]")
+# Candidate data rows of an innings, in document order; a plain contains()
+# is much cheaper than has_class() here and parse_scorecard checks the tokens
+_SCORECARD_INNINGS_ROWS = xpath(".//div[contains(@class, 'cb-scrd-') or contains(@class, 'cb-col-rt')]")
+_FALL_OF_WICKET = re.compile(r'(\d+-\d+)\s*\(\s*([^,()]+?)\s*,\s*([\d.]+)\s*\)')
+
+def _row_columns(row):
+    return [col for col in row if col.tag == 'div']
+
+def _has_profile_link(element):
+    return any('/profiles/' in link.get('href', '') for link in element.iter('a'))
+
+def parse_scorecard(html):
+    """
+    Parse a Cricbuzz scorecard page into match status and innings.
+
+    Each innings is walked once, row by row in document order. Sub-headers
+    ("Batter", "Bowler", "Fall of Wickets", ...) switch the section that the
+    following rows belong to, and each cell's text is read exactly once.
+    """
+    root = parse_html(html)
+
+    scorecard_data = {"innings": []}
+
+    match_status_elem = first(_SCORECARD_STATUS, root)
+    if match_status_elem is not None:
+        scorecard_data['match_status'] = text(match_status_elem).strip()
+
+    # Cricbuzz uses divs with id like 'innings_1', 'innings_2'
+    innings_divs = _SCORECARD_INNINGS(root)
+    if not innings_divs and _SCORECARD_ROWS_DEEP(root):
+        # No innings containers; read the whole page as one innings
+        innings_divs = [root]
+    if not innings_divs:
+        return {"error": "Could not find innings scorecards on the page"}
+
+    for innings_div in innings_divs:
+        inning_data = {
+            "title": None, "score": None, "batting": [], "bowling": [], "extras": None,
+            "total": None, "fall_of_wickets": [], "did_not_bat": []
+        }
+        section = "batting"
+
+        for row in _SCORECARD_INNINGS_ROWS(innings_div):
+            classes = row.get('class', '').split()
+            cols = _row_columns(row)
+
+            if 'cb-scrd-hdr-rw' in classes:
+                if inning_data['title'] is None:
+                    parts = [text(span).strip() for span in row.iter('span')]
+                    inning_data['title'] = parts[0] if parts else text(row).strip()
+                    inning_data['score'] = parts[1] if len(parts) > 1 else None
+                continue
+
+            if 'cb-scrd-sub-hdr' in classes:
+                label = text(cols[0] if cols else row).strip().lower()
+                if label.startswith('bat'):
+                    section = "batting"
+                elif label.startswith('bowl'):
+                    section = "bowling"
+                elif label.startswith('fall of wicket'):
+                    section = "fall_of_wickets"
+                elif len(cols) == 8:
+                    section = "bowling"
+                else:
+                    section = "other"
+                continue
+
+            if 'cb-col-rt' in classes:
+                if section == "fall_of_wickets":
+                    inning_data['fall_of_wickets'].extend(
+                        {"score": score, "player": player, "over": over}
+                        for score, player, over in _FALL_OF_WICKET.findall(text(row))
+                    )
+                continue
+
+            if 'cb-scrd-itms' not in classes or not cols or section == "other":
+                continue
+            if _has_profile_link(cols[0]):
+                values = [text(col).strip() for col in cols]
+                if section == "bowling" and len(values) >= 8:
+                    inning_data['bowling'].append({
+                        "player": values[0], "O": values[1], "M": values[2], "R": values[3],
+                        "W": values[4], "NB": values[5], "WD": values[6], "ECO": values[7]
+                    })
+                elif section == "batting" and len(values) >= 7:
+                    inning_data['batting'].append({
+                        "player": values[0], "dismissal": values[1], "R": values[2],
+                        "B": values[3], "4s": values[4], "6s": values[5], "SR": values[6]
+                    })
+                continue
+
+            label = text(cols[0]).strip().lower()
+            if label == 'extras' or label == 'total':
+                values = [text(col).strip() for col in cols[1:]]
+                inning_data[label] = " ".join(value for value in values if value) or 'N/A'
+            elif label in ('did not bat', 'yet to bat'):
+                names = [text(link).strip() for col in cols[1:] for link in col.iter('a')]
+                if not names:
+                    names = [name.strip() for col in cols[1:] for name in text(col).split(',') if name.strip()]
+                inning_data['did_not_bat'] = names
+
+        if inning_data['title'] is None:
+            inning_data['title'] = f"Innings {len(scorecard_data['innings']) + 1}"
+        scorecard_data['innings'].append(inning_data)
+
+    return scorecard_data
+
+_PROFILE_LINKS = xpath("//a[contains(@href, '/profiles/')]")
+_SERIES_HEADER_LINK = xpath(f"(//div[{has_class('cb-nav-subhdr')}]//a[contains(@href, '/cricket-series/')])[1]")
+_SERIES_ANY_LINK = xpath("(//a[contains(@href, '/cricket-series/')])[1]")
+_SERIES_ID = re.compile(r'/cricket-series/(\d+)')
+_SCORECARD_MATCH_ID = re.compile(r'/live-cricket-scorecard/(\d+)')
+
+# Bump when parse_scorecard's output changes: cards archived by older code
+# are then refetched and replaced instead of being served
+SCORECARD_PARSER_VERSION = 1
+scorecard_archive = ScorecardArchive(version=SCORECARD_PARSER_VERSION)
+
+def parse_profile_links(html):
+    """(profile URL, [player name]) for every player profile link on a page, for the player index."""
+    return [(link.get('href'), [text(link).strip()]) for link in _PROFILE_LINKS(parse_html(html))]
+
+def parse_series_id(html):
+    """Cricbuzz series ID from the page's "Series:" link, or None."""
+    root = parse_html(html)
+    link = first(_SERIES_HEADER_LINK, root)
+    if link is None:
+        link = first(_SERIES_ANY_LINK, root)
+    match = _SERIES_ID.search(link.get('href', '')) if link is not None else None
+    return int(match.group(1)) if match else None
+
+def _json_with(body, **fields):
+    """Append fields to a serialized JSON object (archived scorecards are stored pre-serialized)."""
+    extra = b",".join(f"{json.dumps(key)}:{json.dumps(value)}".encode() for key, value in fields.items())
+    return body[:-1] + (b"," if len(body) > 2 else b"") + extra + b"}"
+
+def _json_response(body, status=200):
+    return app.response_class(body + b"\n", status=status, mimetype='application/json')
+
 @app.route('/scrape/scorecard', methods=['GET'])
+@cached(ttl=SCORECARD_CACHE_TTL)
 def scrape_scorecard():
     """Scrape detailed scorecard from a given Cricbuzz URL (?url=...)"""
     url = request.args.get('url')
-    app.logger.info(f"--- Scraping Scorecard URL: {url} ---") # DEBUG LOG
     if not url:
-        app.logger.error("Scorecard scrape failed: Missing 'url' query parameter")
         return jsonify({"error": "Missing 'url' query parameter"}), 400
 
     # Basic URL validation (optional)
     if not url.startswith("https://www.cricbuzz.com/"):
-        app.logger.error(f"Scorecard scrape failed: Invalid URL format: {url}")
         return jsonify({"error": "Invalid Cricbuzz URL provided"}), 400
 
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'lxml')
-
-        scorecard_data = {"url": url, "innings": []}
-
-        # --- Attempt to find match status/result ---
-        match_status_elem = soup.find('div', class_='cb-text-complete') # Example class, might need adjustment
-        if match_status_elem:
-            scorecard_data['match_status'] = match_status_elem.text.strip()
-            app.logger.info(f"Found Match Status: {scorecard_data['match_status']}") # DEBUG LOG
-        else:
-            app.logger.warning("Match status element ('cb-text-complete') not found.") # DEBUG LOG
-
-
-        # --- Attempt to find innings blocks ---
-        # Cricbuzz often uses divs with id like 'innings_1', 'innings_2'
-        innings_divs = soup.find_all('div', id=lambda x: x and x.startswith('innings_'))
-        app.logger.info(f"Found {len(innings_divs)} potential innings divs by ID.") # DEBUG LOG
-
-        if not innings_divs:
-             # Fallback: Look for common scorecard container classes
-             app.logger.warning("Innings divs by ID not found. Trying fallback selector 'cb-col cb-col-100 cb-scrd-itms'.") # DEBUG LOG
-             innings_divs = soup.find_all('div', class_='cb-col cb-col-100 cb-scrd-itms') # Example class
-             app.logger.info(f"Found {len(innings_divs)} potential innings divs by fallback class.") # DEBUG LOG
-
-
-        if not innings_divs:
-            app.logger.error("Could not find any innings scorecards on the page.")
-            return jsonify({"error": "Could not find innings scorecards on the page", "url": url}), 404
-
-        for i, innings_div in enumerate(innings_divs):
-            app.logger.info(f"Processing Innings Div {i+1}...") # DEBUG LOG
-            inning_data = {"batting": [], "bowling": [], "extras": None, "total": None, "fall_of_wickets": None}
-
-            # Innings Title (e.g., "RCB Innings")
-            title_elem = innings_div.find('div', class_='cb-scrd-hdr-rw') # Example class
-            inning_data['title'] = title_elem.text.strip() if title_elem else f"Innings {len(scorecard_data['innings']) + 1}"
-            app.logger.info(f"  Innings Title: {inning_data['title']}") # DEBUG LOG
-
-            # --- Batting Scorecard ---
-            # Refined selector: Find the container, then look for player rows within it.
-            # This assumes player rows are direct children divs with a link inside.
-            batting_rows_container = innings_div # Often the innings div itself contains the rows
-            if batting_rows_container:
-                # Find rows that seem to contain player data (e.g., have a link for the player name)
-                player_rows = batting_rows_container.find_all('div', class_='cb-col cb-col-100 cb-scrd-itms', recursive=False) # Look for direct children first
-                app.logger.info(f"  Found {len(player_rows)} potential batting rows/items in container.") # DEBUG LOG
-
-                if not player_rows: # If direct children didn't work, search deeper
-                     player_rows = batting_rows_container.find_all('div', class_='cb-col cb-col-100 cb-scrd-itms')
-                     app.logger.info(f"  Found {len(player_rows)} potential batting rows/items searching deeper.") # DEBUG LOG
-
-
-                batters_found = 0
-                for row_idx, row in enumerate(player_rows):
-                     # Check if it looks like a player row (e.g., contains a player link)
-                     player_link = row.find('a', href=lambda x: x and '/profiles/' in x)
-                     if player_link:
-                         cols = row.find_all('div', class_=lambda x: x and x.startswith('cb-col cb-col-'), recursive=False)
-                         app.logger.info(f"    Row {row_idx+1}: Found {len(cols)} columns. Player link: {player_link.text.strip()}") # DEBUG LOG
-                         if len(cols) >= 7: # Expect player, dismissal, R, B, 4s, 6s, SR
-                             player_name = cols[0].text.strip()
-                             dismissal = cols[1].text.strip()
-                             runs = cols[2].text.strip()
-                             balls = cols[3].text.strip()
-                             fours = cols[4].text.strip()
-                             sixes = cols[5].text.strip()
-                             sr = cols[6].text.strip()
-                             inning_data['batting'].append({
-                                 "player": player_name, "dismissal": dismissal, "R": runs,
-                                 "B": balls, "4s": fours, "6s": sixes, "SR": sr
-                             })
-                             batters_found += 1
-                         else:
-                             app.logger.warning(f"    Row {row_idx+1}: Expected >= 7 columns for player, found {len(cols)}.") # DEBUG LOG
-                     elif "Extras" in row.text:
-                         extras_val_elem = row.find('div', class_='cb-col-right')
-                         inning_data['extras'] = extras_val_elem.text.strip() if extras_val_elem else 'N/A'
-                         app.logger.info(f"    Row {row_idx+1}: Found Extras: {inning_data['extras']}") # DEBUG LOG
-                     elif "Total" in row.text:
-                         total_val_elem = row.find('div', class_='cb-col-right')
-                         inning_data['total'] = total_val_elem.text.strip() if total_val_elem else 'N/A'
-                         app.logger.info(f"    Row {row_idx+1}: Found Total: {inning_data['total']}") # DEBUG LOG
-                     # Add checks for "Did not bat" or "Fall of wickets" sections if needed
-
-                app.logger.info(f"  Finished processing batting rows. Found {batters_found} batters.") # DEBUG LOG
-            else:
-                app.logger.warning("  Could not find batting rows container.") # DEBUG LOG
-
-
-            # --- Bowling Scorecard --- (Placeholder - needs similar detailed logic)
-            app.logger.info("  Processing Bowling Scorecard (Placeholder)...") # DEBUG LOG
-            # bowling_table = innings_div.find(...) # Find the specific bowling table
-            # if bowling_table:
-            #    bowler_rows = bowling_table.find_all(...)
-            #    for row in bowler_rows:
-            #        cols = row.find_all(...)
-            #        if len(cols) >= 6: # O, M, R, W, Econ, 0s etc.
-            #           ... extract data ...
-            #           inning_data['bowling'].append({...})
-
-            # --- Fall of Wickets --- (Placeholder - needs similar detailed logic)
-            app.logger.info("  Processing Fall of Wickets (Placeholder)...") # DEBUG LOG
-            # fow_div = innings_div.find('div', text=re.compile(r'Fall of Wickets')) # Example
-            # if fow_div:
-            #    fow_data = fow_div.find_next_sibling('div').text.strip() # Example
-            #    inning_data['fall_of_wickets'] = fow_data
+    # Completed matches are served from the archive without going upstream
+    match_id_match = _SCORECARD_MATCH_ID.search(url)
+    match_id = int(match_id_match.group(1)) if match_id_match else None
+    if match_id is not None:
+        archived = scorecard_archive.get(match_id)
+        if archived is not None:
+            metrics.note("archive", "hit")
+            set_ttl(scheduler.IDLE_INTERVAL)
+            return _json_response(_json_with(archived[2], url=url))
 
-
-            scorecard_data['innings'].append(inning_data)
-
-        app.logger.info(f"--- Finished Scraping Scorecard. Innings found: {len(scorecard_data['innings'])} ---") # DEBUG LOG
-        return jsonify(scorecard_data)
+    try:
+        scorecard_data = upstream.get_parsed(url, parse_scorecard)
+        if "error" in scorecard_data:
+            return jsonify({**scorecard_data, "url": url}), 404
+        # The page was fetched just now, so these reuse it without another request
+        player_index.add_many(upstream.get_parsed(url, parse_profile_links, max_age=SCORECARD_CACHE_TTL))
+        if match_id is not None and scorecard_data.get('match_status'):
+            # A result (cb-text-complete) means the scorecard is final
+            series_id = upstream.get_parsed(url, parse_series_id, max_age=SCORECARD_CACHE_TTL)
+            scorecard_archive.add(match_id, series_id, url, scorecard_data)
+        # A match in progress is refetched every few seconds; a result never changes
+        set_ttl(scheduler.IDLE_INTERVAL if scorecard_data.get('match_status') else scheduler.LIVE_INTERVAL)
+        return jsonify({"url": url, **scorecard_data})
 
     except requests.RequestException as e:
-        app.logger.error(f"Failed to fetch scorecard URL {url}: {str(e)}")
         return jsonify({"error": f"Failed to fetch scorecard URL: {str(e)}", "url": url}), 500
     except Exception as e:
         # Log the full error for debugging
         app.logger.error(f"Error scraping scorecard URL {url}: {str(e)}", exc_info=True)
         return jsonify({"error": f"An unexpected error occurred while scraping scorecard: {str(e)}", "url": url}), 500
 
+@app.route('/archive/scorecards/<int:match_id>', methods=['GET'])
+def get_archived_scorecard(match_id):
+    """Archived scorecard of a completed match, served from disk"""
+    archived = scorecard_archive.get(match_id)
+    if archived is None:
+        return jsonify({"error": f"Match {match_id} is not archived; fetch it once through /scrape/scorecard after it finishes"}), 404
+    url, series_id, body = archived
+    metrics.note("archive", "hit")
+    response = _json_response(_json_with(body, match_id=match_id, series_id=series_id, url=url))
+    response.cache_control.public = True
+    response.cache_control.max_age = ARCHIVE_MAX_AGE
+    return response
+
+@app.route('/archive/series/<int:series_id>', methods=['GET'])
+def get_archived_series(series_id):
+    """All archived (completed) scorecards of a series, by match ID"""
+    matches = [_json_with(body, match_id=match_id, url=url) for match_id, url, body in scorecard_archive.series(series_id)]
+    if not matches:
+        return jsonify({"error": f"No archived scorecards for series {series_id}"}), 404
+    return _json_response(_json_with(b"{\"matches\":[" + b",".join(matches) + b"]}", count=len(matches), series_id=series_id))
+
+def _archive_metric_lines():
+    return metrics.family("scorecard_archive_lookups_total", "counter", "Scorecard archive lookups, by result.", ("result",),
+                          [(("hit",), scorecard_archive.hits), (("miss",), scorecard_archive.misses)])
+
+metrics.add_collector(_archive_metric_lines)
+
+
+_SERIES_SECTIONS = xpath(f"//div[{has_class('cb-sch-lst')}]")
+_SERIES_CATEGORY_HEADER = xpath(f"preceding::h2[{class_is('cb-col-100 cb-sch-hdr')}][1]")
+_SERIES_ITEMS = xpath(f".//div[{class_is('cb-col-100 cb-col')}]")
+
+def parse_all_series(html):
+    """Parse the all-series page into categories of series names and IDs."""
+    root = parse_html(html)
+
+    series_sections = _SERIES_SECTIONS(root)
+    if not series_sections:
+        return {"error": "No series found on the page"}
+
+    all_series_data = []
+    for section in series_sections:
+        category_header = first(_SERIES_CATEGORY_HEADER, section)
+        category = text(category_header).strip() if category_header is not None else "Unknown"
+        series_list = []
+        for series_item in _SERIES_ITEMS(section):
+            if not text(series_item).strip():
+                continue
+            series_info = first(_FIRST_LINK, series_item)
+            if series_info is not None and '/series/' in series_info.attrib['href']:
+                series_name = text(series_info).strip()
+                series_id_match = re.search(r'/series/(\d+)/', series_info.attrib['href'])
+                series_id = series_id_match.group(1) if series_id_match else "N/A"
+                series_list.append({
+                    "series_name": series_name,
+                    "series_id": series_id
+                })
+        all_series_data.append({
+            "category": category,
+            "series": series_list
+        })
+    return all_series_data
 
 @app.route('/all-series', methods=['GET'])
+@cached(ttl=SERIES_CACHE_TTL)
 def all_series():
-    """Get all cricket series"""
+    """Get all cricket series (?category=, ?team=, ?fields=; ?limit= and ?offset= per category)"""
+    try:
+        query = Query.from_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     try:
         url = "https://www.cricbuzz.com/cricket-schedule/series/all"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'lxml')
-
-        series_sections = soup.find_all('div', class_='cb-sch-lst')
-        if not series_sections:
-            return jsonify({"error": "No series found on the page"}), 404
-
-        all_series_data = []
-        for section in series_sections:
-            category_header = section.find_previous('h2', class_='cb-col-100 cb-sch-hdr')
-            category = category_header.text.strip() if category_header else "Unknown"
-            series_items = section.find_all('div', class_='cb-col-100 cb-col')
-            series_list = []
-            for series_item in series_items:
-                if not series_item.text.strip():
-                    continue
-                series_info = series_item.find('a')
-                if series_info and '/series/' in series_info['href']:
-                    series_name = series_info.text.strip()
-                    series_id_match = re.search(r'/series/(\d+)/', series_info['href'])
-                    series_id = series_id_match.group(1) if series_id_match else "N/A"
-                    series_list.append({
-                        "series_name": series_name,
-                        "series_id": series_id
-                    })
-            all_series_data.append({
-                "category": category,
-                "series": series_list
-            })
+        all_series_data = upstream.get_parsed(url, parse_all_series)
+        if isinstance(all_series_data, dict) and "error" in all_series_data:
+            return jsonify(all_series_data), 404
+        if query:
+            filtered = []
+            for group in all_series_data:
+                series = query.apply(group["series"], teams=lambda s: (s["series_name"],),
+                                     category=lambda s, category=group["category"]: category)
+                if series or not (query.team or query.category):
+                    filtered.append({"category": group["category"], "series": series})
+            all_series_data = filtered
         return jsonify(all_series_data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     except requests.RequestException as e:
         return jsonify({"error": f"Failed to fetch series list: {str(e)}"}), 500
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
-@app.route('/ipl-schedule/<int:year>/<int:series_id>', methods=['GET'])
-def get_ipl_schedule(year, series_id):
-    """Get IPL schedule for a given year and series"""
+# In-memory series catalogue, rebuilt in the background from the all-series page
+series_catalogue = SeriesCatalogue(parse_all_series)
+
+@app.route('/series/<int:series_id>', methods=['GET'])
+def get_series(series_id):
+    """Look up a series by ID in the series catalogue"""
     try:
-        url = f"https://www.cricbuzz.com/cricket-series/{series_id}/indian-premier-league-{year}/matches"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/107.0.0.0 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers)
-        
-        if response.status_code != 200:
-            return jsonify({"error": f"Failed to fetch data from Cricbuzz for IPL {year}"}), 500
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        matches = []
-        
-        # Create IST timezone (UTC+5:30)
-        ist_timezone = timezone(timedelta(hours=5, minutes=30))
-        
-        for row in soup.select('div.cb-col-100.cb-col.cb-series-matches'):
-            try:
-                date_div = row.select_one('div.cb-col-25 span')
-                match_div = row.select_one('div.cb-col-60')
-                time_div = row.select_one('div.cb-col-40')
-                
-                if not all([date_div, match_div, time_div]):
-                    continue
-                
-                date = date_div.text.strip()  # e.g., "Mar 26, Wed"
-                
-                # Extract match details
-                match_link_elem = match_div.select_one('a')
-                if not match_link_elem:
-                    continue
-                    
-                match_link = match_link_elem['href']
-                match_title = match_link_elem.select_one('span').text.strip()
-                
-                # Parse teams and match number
-                if ' vs ' in match_title and ', ' in match_title:
-                    teams_part, match_number = match_title.rsplit(', ', 1)
-                    team1, team2 = teams_part.split(' vs ', 1)
-                else:
-                    team1, team2, match_number = "Unknown", "Unknown", match_title
-                
-                venue = match_div.select_one('div.text-gray').text.strip()
-                
-                # Determine match status
-                status_elem = match_div.select_one('a.cb-text-complete, a.cb-text-live, a.cb-text-preview, a.cb-text-drink')
-                status_text = status_elem.text.strip() if status_elem else "Upcoming"
+        entry = series_catalogue.get(series_id)
+    except requests.RequestException as e:
+        return jsonify({"error": f"Failed to fetch series list: {str(e)}"}), 500
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+    if entry is None:
+        return jsonify({"error": f"Series {series_id} not found in the series catalogue"}), 404
+    return jsonify(entry)
+
+@app.route('/series/search', methods=['GET'])
+def search_series():
+    """Search the series catalogue by name prefix (?q=, ?category=, ?limit=)"""
+    q = request.args.get('q', '').strip()
+    category = request.args.get('category', '').strip() or None
+    if not q and not category:
+        return jsonify({"error": "Missing 'q' (or 'category') query parameter"}), 400
+    limit = max(1, min(request.args.get('limit', SEARCH_LIMIT, type=int), 100))
+    try:
+        results = series_catalogue.search(q, limit, category) if q else series_catalogue.in_category(category)[:limit]
+    except requests.RequestException as e:
+        return jsonify({"error": f"Failed to fetch series list: {str(e)}"}), 500
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+    return jsonify({"query": q, "category": category, "results": results})
+
+_IPL_MATCH_ROWS = xpath(f"//div[{has_class('cb-col-100')} and {has_class('cb-col')} and {has_class('cb-series-matches')}]")
+_IPL_DATE = xpath(f"(.//div[{has_class('cb-col-25')}]//span)[1]")
+_IPL_MATCH_INFO = xpath(f"(.//div[{has_class('cb-col-60')}])[1]")
+_IPL_TIME_INFO = xpath(f"(.//div[{has_class('cb-col-40')}])[1]")
+_IPL_TITLE = xpath("(.//span)[1]")
+_IPL_VENUE = xpath(f"(.//div[{has_class('text-gray')}])[1]")
+_IPL_STATUS = xpath(f"(.//a[{has_class('cb-text-complete')} or {has_class('cb-text-live')} or {has_class('cb-text-preview')} or {has_class('cb-text-drink')}])[1]")
+_IPL_START_TIME = xpath(f"(.//span[{has_class('schedule-date')}])[1]")
+_IPL_GMT_TIME = xpath(f"(.//div[{has_class('cb-font-12')}])[1]")
+
+def parse_ipl_schedule(html, year):
+    """Parse an IPL series matches page into a list of match dicts."""
+    root = parse_html(html)
+    matches = []
+    
+    # Create IST timezone (UTC+5:30)
+    ist_timezone = timezone(timedelta(hours=5, minutes=30))
+    
+    for row in _IPL_MATCH_ROWS(root):
+        try:
+            date_div = first(_IPL_DATE, row)
+            match_div = first(_IPL_MATCH_INFO, row)
+            time_div = first(_IPL_TIME_INFO, row)
+            
+            if date_div is None or match_div is None or time_div is None:
+                continue
+            
+            date = text(date_div).strip()  # e.g., "Mar 26, Wed"
+            
+            # Extract match details
+            match_link_elem = first(_FIRST_LINK, match_div)
+            if match_link_elem is None:
+                continue
                 
-                if "won by" in status_text:
-                    status = "Completed"
-                    result = status_text
-                elif status_text == "Strategic Timeout" or "live" in status_text.lower():
-                    status = "Live"
-                    result = None
+            match_link = match_link_elem.attrib['href']
+            match_title = text(first(_IPL_TITLE, match_link_elem)).strip()
+            
+            # Parse teams and match number
+            if ' vs ' in match_title and ', ' in match_title:
+                teams_part, match_number = match_title.rsplit(', ', 1)
+                team1, team2 = teams_part.split(' vs ', 1)
+            else:
+                team1, team2, match_number = "Unknown", "Unknown", match_title
+            
+            venue = text(first(_IPL_VENUE, match_div)).strip()
+            
+            # Determine match status
+            status_elem = first(_IPL_STATUS, match_div)
+            status_text = text(status_elem).strip() if status_elem is not None else "Upcoming"
+            
+            if "won by" in status_text:
+                status = "Completed"
+                result = status_text
+            elif status_text == "Strategic Timeout" or "live" in status_text.lower():
+                status = "Live"
+                result = None
+            else:
+                status = "Upcoming"
+                result = None
+            
+            # Extract match time
+            timestamp_elem = first(_IPL_START_TIME, time_div)
+            match_time = text(timestamp_elem).strip()  # e.g., "7:30 PM"
+            
+            # Parse date and time
+            try:
+                # Extract timestamp if available
+                if timestamp_elem.get('timestamp') is not None:
+                    timestamp_ms = int(timestamp_elem.get('timestamp'))
+                    match_datetime = datetime.fromtimestamp(timestamp_ms/1000, tz=ist_timezone)
                 else:
-                    status = "Upcoming"
-                    result = None
-                
-                # Extract match time
-                match_time = time_div.select_one('span.schedule-date').text.strip()  # e.g., "7:30 PM"
-                
-                # Parse date and time
-                try:
-                    # Extract timestamp if available
-                    timestamp_elem = time_div.select_one('span.schedule-date')
-                    if timestamp_elem and 'timestamp' in timestamp_elem.attrs:
-                        timestamp_ms = int(timestamp_elem['timestamp'])
-                        match_datetime = datetime.fromtimestamp(timestamp_ms/1000, tz=ist_timezone)
-                    else:
-                        # Manual parsing as fallback
-                        date_parts = date.split(", ")[0]  # Get "Mar 26" from "Mar 26, Wed"
-                        date_str = f"{date_parts} {year}"  # Create "Mar 26 2025"
-                        
-                        # Parse date
-                        match_date = datetime.strptime(date_str, "%b %d %Y")
-                        
-                        # Parse time
-                        time_obj = datetime.strptime(match_time, "%I:%M %p")
-                        
-                        # Combine date and time
-                        match_datetime = datetime(
-                            year=match_date.year,
-                            month=match_date.month,
-                            day=match_date.day,
-                            hour=time_obj.hour,
-                            minute=time_obj.minute,
-                            tzinfo=ist_timezone
-                        )
-                    
-                    formatted_date_time = match_datetime.isoformat()
-                except Exception as e:
-                    formatted_date_time = f"{date} {match_time}"
-                
-                # Extract GMT time
-                time_details = time_div.select_one('div.cb-font-12')
-                gmt_time = time_details.text.strip().split('/')[0].strip() if time_details else "GMT time not available"
+                    # Manual parsing as fallback
+                    date_parts = date.split(", ")[0]  # Get "Mar 26" from "Mar 26, Wed"
+                    # Date and time in one pass, e.g. "Mar 26 2025 7:30 PM"
+                    match_datetime = datetime.strptime(f"{date_parts} {year} {match_time}", "%b %d %Y %I:%M %p")
+                    match_datetime = match_datetime.replace(tzinfo=ist_timezone)
                 
-                matches.append({
-                    "date": date,
-                    "match_number": match_number,
-                    "team1": team1,
-                    "team2": team2,
-                    "venue": venue,
-                    "match_time": match_time,
-                    "gmt_time": gmt_time,
-                    "formatted_date_time": formatted_date_time,
-                    "status": status,
-                    "is_live": status == "Live",
-                    "result": result,
-                    "match_link": f"https://www.cricbuzz.com{match_link}"
-                })
+                formatted_date_time = match_datetime.isoformat()
             except Exception as e:
-                # Log the error but continue processing other matches
-                print(f"Error processing match: {str(e)}")
-                continue
-        
+                formatted_date_time = f"{date} {match_time}"
+            
+            # Extract GMT time
+            time_details = first(_IPL_GMT_TIME, time_div)
+            gmt_time = text(time_details).strip().split('/')[0].strip() if time_details is not None else "GMT time not available"
+            
+            matches.append({
+                "date": date,
+                "match_number": match_number,
+                "team1": team1,
+                "team2": team2,
+                "venue": venue,
+                "match_time": match_time,
+                "gmt_time": gmt_time,
+                "formatted_date_time": formatted_date_time,
+                "status": status,
+                "is_live": status == "Live",
+                "result": result,
+                "match_link": f"https://www.cricbuzz.com{match_link}"
+            })
+        except Exception:
+            # Skip the match but keep processing the others
+            metrics.PARSE_ERRORS.inc("ipl_schedule")
+            continue
+    
+    return matches
+
+@app.route('/ipl-schedule/<int:year>/<int:series_id>', methods=['GET'])
+@cached(ttl=IPL_SCHEDULE_CACHE_TTL)
+def get_ipl_schedule(year, series_id):
+    """Get IPL schedule for a given year and series (?status=, ?team=, ?fields=, ?limit=, ?offset=)"""
+    try:
+        query = Query.from_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        url = f"https://www.cricbuzz.com/cricket-series/{series_id}/indian-premier-league-{year}/matches"
+
+        try:
+            matches = upstream.get_parsed(url, parse_ipl_schedule, year)
+        except requests.HTTPError:
+            return jsonify({"error": f"Failed to fetch data from Cricbuzz for IPL {year}"}), 500
+
+        # Calendar queries (/matches) read the same parsed list
+        schedule_store.update(series_id, matches, source=(url, year))
+        # Seconds while a match is live, a minute before one starts, an hour once the season is over
+        set_ttl(scheduler.interval_for((match["status"], match["formatted_date_time"]) for match in matches))
         return jsonify({
             "season": year,
             "series_id": series_id,
-            "matches": matches
+            "matches": query.apply(matches, status=lambda match: match["status"],
+                                   teams=lambda match: (match["team1"], match["team2"]))
         })
     
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-# Cache to store points table data
-points_table_cache = {"data": None, "timestamp": 0}
-CACHE_DURATION = 3600  # Cache for 1 hour
-
-def scrape_points_table():
-    """
-    Scrapes the IPL 2025 points table from Cricbuzz and returns a list of team data.
-    
-    Returns:
-        list: List of dictionaries containing team position, name, matches, wins, losses,
-              ties, no results, points, and net run rate. Returns an error dict if scraping fails.
-    """
-    # Define the URL and headers to mimic a browser request
-    url = "https://www.cricbuzz.com/cricket-series/9237/indian-premier-league-2025/points-table"
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-
-    # Fetch the page
+@app.route('/ipl-schedule/<int:year>', methods=['GET'])
+def get_ipl_schedule_by_year(year):
+    """Get IPL schedule for a given year, with the series ID looked up in the series catalogue"""
     try:
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            return {"error": f"Failed to fetch page, status code: {response.status_code}"}
+        entry = series_catalogue.ipl(year)
     except requests.RequestException as e:
-        return {"error": f"Request failed: {str(e)}"}
-
-    # Parse the HTML
-    soup = BeautifulSoup(response.content, "html.parser")
-
-    # Find the points table (assuming class 'cb-srs-pnts')
-    table = soup.find("table", class_="cb-srs-pnts")
-    # print(table.prettify())
-    if not table:
-        return {"error": "Points table not found on the page"}
+        return jsonify({"error": f"Failed to fetch series list: {str(e)}"}), 500
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+    if entry is None:
+        return jsonify({"error": f"IPL {year} is not in the series catalogue; use /ipl-schedule/{year}/<series_id>"}), 404
+    return get_ipl_schedule(year, int(entry["series_id"]))
 
-    # Initialize the result list and position counter
-    points_data = []
-    position = 1
+IPL_2025_SERIES_ID = 9237
 
-    # Process each row in the table
-    for row in table.find_all("tr"):
-        tds = row.find_all("td")
-        # Check if this is a team data row (9 <td> elements)
-        if len(tds) == 9:
-            try:
-                # Extract team name from the first <td>
-                team_div = tds[0].find("div", class_="cb-col cb-col-84")
-                if not team_div:
-                    continue  # Skip if team name div is missing
-                team_name = team_div.text.strip()
-
-                # Extract stats with safe conversion
-                def safe_int(text):
-                    try:
-                        return int(text.strip())
-                    except (ValueError, AttributeError):
-                        return 0
-
-                def safe_str(text):
-                    return text.strip() if text else "N/A"
-
-                matches = safe_int(tds[1].text)
-                wins = safe_int(tds[2].text)
-                losses = safe_int(tds[3].text)
-                ties = safe_int(tds[4].text)
-                no_results = safe_int(tds[5].text)
-                points = safe_int(tds[6].text)
-                nrr = safe_str(tds[7].text)
-
-                # Compile team data
-                team_data = {
-                    "position": position,
-                    "team": team_name,
-                    "matches": matches,
-                    "wins": wins,
-                    "losses": losses,
-                    "ties": ties,
-                    "no_results": no_results,
-                    "points": points,
-                    "nrr": nrr
-                }
-                points_data.append(team_data)
-                position += 1
-            except Exception as e:
-                # Log error and continue to next row
-                print(f"Error processing row for position {position}: {str(e)}")
-                continue
+# Series whose points tables stay reachable after they drop off the all-series page
+KNOWN_SERIES = {IPL_2025_SERIES_ID: "Indian Premier League 2025"}
 
-    return points_data if points_data else {"error": "No team data extracted"}
+# Standings columns; the summary table is the detailed one without match_details
+POINTS_TABLE_FIELDS = ("position", "team", "matches", "wins", "losses", "ties", "no_results", "points", "nrr")
 
-@app.route('/ipl/2025/points-table', methods=['GET'])
-def get_points_table():
-    """
-    API endpoint to get the IPL 2025 points table.
-    """
-    current_time = time.time()
-    
-    # Check cache
-    if (points_table_cache["data"] and 
-        (current_time - points_table_cache["timestamp"]) < CACHE_DURATION):
-        return jsonify(points_table_cache["data"])
-    
-    # Scrape fresh data
-    data = scrape_points_table()
-    if "error" in data:
-        return jsonify(data), 500
-    
-    # Update cache
-    points_table_cache["data"] = data
-    points_table_cache["timestamp"] = current_time
-    
-    return jsonify(data)
+def series_name(series_id):
+    """Name of a series (from KNOWN_SERIES or the series catalogue), or None."""
+    if series_id in KNOWN_SERIES:
+        return KNOWN_SERIES[series_id]
+    entry = series_catalogue.get(series_id)
+    return entry["series_name"] if entry is not None else None
 
-def scrape_detailed_points_table():
+def series_has_live_match(series_id, name):
+    """Whether /live currently shows a match in progress in this series."""
+    try:
+        snapshot = live_poller.snapshot()
+    except requests.RequestException:
+        return False
+    if snapshot.status != 200:
+        return False
+    key = normalize_name(name)
+    return any(live_match_state(match) == "live" and normalize_name(match.get('series') or '') == key
+               for match in snapshot.data)
+
+def scrape_detailed_points_table(series_id=IPL_2025_SERIES_ID):
     """
-    Scrapes the IPL 2025 detailed points table from Cricbuzz, including match details for each team.
+    Scrapes a series' detailed points table from Cricbuzz, including match details for each team.
     
     Returns:
         list: List of dictionaries containing team position, name, matches, wins, losses,
               ties, no results, points, net run rate, and match details.
         dict: Error message if scraping fails.
+        None: If the series is not known.
     """
-    url = "https://www.cricbuzz.com/cricket-series/9237/indian-premier-league-2025/points-table"
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-
-    # Fetch the webpage
+    # Both points-table endpoints read this one model, kept per series in
+    # points_tables, so a table is fetched and parsed once per its TTL
     try:
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            return {"error": f"Failed to fetch page, status code: {response.status_code}"}
+        return points_tables.get(series_id)
+    except requests.HTTPError as e:
+        return {"error": f"Failed to fetch page, status code: {e.response.status_code}"}
     except requests.RequestException as e:
         return {"error": f"Request failed: {str(e)}"}
 
+def scrape_points_table(series_id=IPL_2025_SERIES_ID):
+    """
+    Scrapes a series' points table from Cricbuzz and returns a list of team data.
+    
+    Returns:
+        list: List of dictionaries containing team position, name, matches, wins, losses,
+              ties, no results, points, and net run rate. Returns an error dict if scraping
+              fails, or None if the series is not known.
+    """
+    data = scrape_detailed_points_table(series_id)
+    if data is None or "error" in data:
+        return data
+    return summarize_points_table(data)
+
+def summarize_points_table(detailed):
+    """Project a detailed points table onto the summary columns."""
+    return [{field: team[field] for field in POINTS_TABLE_FIELDS} for team in detailed]
+
+_POINTS_TABLE = xpath(f"(//table[{has_class('cb-srs-pnts')}])[1]")
+_POINTS_ROWS = xpath(".//tr")
+_POINTS_CELLS = xpath(".//td")
+_POINTS_TEAM_NAME = xpath(f"(.//div[{class_is('cb-col cb-col-84')}])[1]")
+_POINTS_MATCH_TABLE = xpath(f"(.//table[{has_class('cb-srs-pnts-dwn-tbl')}])[1]")
+
+def _safe_int(value):
+    try:
+        return int(value.strip())
+    except (ValueError, AttributeError):
+        return 0
+
+def _safe_str(value):
+    return value.strip() if value else "N/A"
+
+def parse_detailed_points_table(html):
+    """Parse the points-table page into team standings with match details, or an error dict."""
     # Parse the HTML
-    soup = BeautifulSoup(response.content, "html.parser")
-    table = soup.find("table", class_="cb-srs-pnts")
-    if not table:
+    root = parse_html(html)
+    table = first(_POINTS_TABLE, root)
+    if table is None:
         return {"error": "Points table not found on the page"}
 
     points_data = []
     position = 1
-    rows = table.find_all("tr")
+    rows = _POINTS_ROWS(table)
 
     # Process rows to extract team data and match details
     i = 0
     while i < len(rows):
         row = rows[i]
-        tds = row.find_all("td")
+        tds = _POINTS_CELLS(row)
 
         # Identify team rows (should have 9 <td> elements)
         if len(tds) == 9:
             try:
                 # Extract team name
-                team_div = tds[0].find("div", class_="cb-col cb-col-84")
-                team_name = team_div.text.strip() if team_div else "Unknown"
-
-                # Helper functions for safe data extraction
-                def safe_int(text):
-                    try:
-                        return int(text.strip())
-                    except (ValueError, AttributeError):
-                        return 0
-
-                def safe_str(text):
-                    return text.strip() if text else "N/A"
+                team_div = first(_POINTS_TEAM_NAME, tds[0])
+                team_name = text(team_div).strip() if team_div is not None else "Unknown"
 
                 # Extract team standings
-                matches = safe_int(tds[1].text)
-                wins = safe_int(tds[2].text)
-                losses = safe_int(tds[3].text)
-                ties = safe_int(tds[4].text)
-                no_results = safe_int(tds[5].text)
-                points = safe_int(tds[6].text)
-                nrr = safe_str(tds[7].text)
-
-                # Look for the dropdown row with match details
+                team_data = {
+                    "position": position,
+                    "team": team_name,
+                    "matches": _safe_int(text(tds[1])),
+                    "wins": _safe_int(text(tds[2])),
+                    "losses": _safe_int(text(tds[3])),
+                    "ties": _safe_int(text(tds[4])),
+                    "no_results": _safe_int(text(tds[5])),
+                    "points": _safe_int(text(tds[6])),
+                    "nrr": _safe_str(text(tds[7])),
+                }
+
+                # The dropdown row after a team row holds its match details
                 match_details = []
-                i += 1  # Move to the next row
-                if i < len(rows):
-                    dropdown_row = rows[i]
-                    match_table = dropdown_row.find("table", class_="cb-srs-pnts-dwn-tbl")
-                    if match_table:
-                        for match_row in match_table.find_all("tr")[1:]:  # Skip header
-                            match_tds = match_row.find_all("td")
+                if i + 1 < len(rows):
+                    match_table = first(_POINTS_MATCH_TABLE, rows[i + 1])
+                    if match_table is not None:
+                        i += 1
+                        for match_row in _POINTS_ROWS(match_table)[1:]:  # Skip header
+                            match_tds = _POINTS_CELLS(match_row)
                             if len(match_tds) == 4:
-                                opponent = safe_str(match_tds[0].text)
-                                description = safe_str(match_tds[1].text)
-                                date = safe_str(match_tds[2].text)
-                                result = safe_str(match_tds[3].text)
                                 match_details.append({
-                                    "opponent": opponent,
-                                    "description": description,
-                                    "date": date,
-                                    "result": result
+                                    "opponent": _safe_str(text(match_tds[0])),
+                                    "description": _safe_str(text(match_tds[1])),
+                                    "date": _safe_str(text(match_tds[2])),
+                                    "result": _safe_str(text(match_tds[3]))
                                 })
 
-                # Compile team data
-                team_data = {
-                    "position": position,
-                    "team": team_name,
-                    "matches": matches,
-                    "wins": wins,
-                    "losses": losses,
-                    "ties": ties,
-                    "no_results": no_results,
-                    "points": points,
-                    "nrr": nrr,
-                    "match_details": match_details
-                }
+                team_data["match_details"] = match_details
                 points_data.append(team_data)
                 position += 1
-            except Exception as e:
-                print(f"Error processing team row: {str(e)}")
+            except Exception:
+                metrics.PARSE_ERRORS.inc("points_table")
         i += 1  # Move to the next row
 
     return points_data if points_data else {"error": "No team data extracted"}
 
+# Parsed points tables of every series asked for, bounded and refreshed per series
+points_tables = PointsTables(parse_detailed_points_table, series_name, series_has_live_match)
+metrics.add_collector(points_tables.metric_lines)
+
+def _points_table_response(series_id, scrape):
+    try:
+        data = scrape(series_id)
+    except ValueError as e:
+        # The series catalogue could not be built
+        return jsonify({"error": str(e)}), 500
+    if data is None:
+        return jsonify({"error": f"Series {series_id} not found in the series catalogue"}), 404
+    if "error" in data:
+        return jsonify(data), 500
+    return jsonify(data)
+
+@app.route('/series/<int:series_id>/points-table', methods=['GET'])
+@cached(ttl=POINTS_TABLE_CACHE_TTL)
+def get_series_points_table(series_id):
+    """Get the points table of any series"""
+    return _points_table_response(series_id, scrape_points_table)
+
+@app.route('/series/<int:series_id>/detailed-points-table', methods=['GET'])
+@cached(ttl=POINTS_TABLE_CACHE_TTL)
+def get_series_detailed_points_table(series_id):
+    """Get the detailed points table of any series, including match details"""
+    return _points_table_response(series_id, scrape_detailed_points_table)
+
+@app.route('/ipl/2025/points-table', methods=['GET'])
+@cached(ttl=POINTS_TABLE_CACHE_TTL)
+def get_points_table():
+    """
+    API endpoint to get the IPL 2025 points table.
+    """
+    return _points_table_response(IPL_2025_SERIES_ID, scrape_points_table)
+
 @app.route('/ipl/2025/detailed-points-table', methods=['GET'])
+@cached(ttl=POINTS_TABLE_CACHE_TTL)
 def get_detailed_points_table():
     """
     API endpoint to get the detailed points table for IPL 2025, including match details.
     """
-    data = scrape_detailed_points_table()
-    if "error" in data:
-        return jsonify(data), 500
-    return jsonify(data)
+    return _points_table_response(IPL_2025_SERIES_ID, scrape_detailed_points_table)
+
+# Schedules of IPL 2025, SCHEDULE_SERIES and every series fetched through
+# /ipl-schedule, as one table for calendar and next-match queries
+schedule_store = ScheduleStore(parse_ipl_schedule, series_name, series=(IPL_2025_SERIES_ID,) + SCHEDULE_SERIES)
+metrics.add_collector(schedule_store.metric_lines)
+
+def _schedule_table():
+    try:
+        return schedule_store.table(), None
+    except requests.RequestException as e:
+        return None, (jsonify({"error": f"Failed to fetch schedules: {str(e)}"}), 500)
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 404)
+
+@app.route('/matches', methods=['GET'])
+def get_matches():
+    """Matches of the tracked series by start time (?from=, ?to= (ISO date/time or epoch seconds), ?team=, ?status=, ?fields=, ?limit=, ?offset=)"""
+    try:
+        query = Query.from_args(request.args)
+        if query.category is not None:
+            raise ValueError("'category' is not supported by this endpoint")
+        start = parse_bound(request.args['from']) if request.args.get('from') else None
+        end = parse_bound(request.args['to'], end=True) if request.args.get('to') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    table, error = _schedule_table()
+    if error is not None:
+        return error
+    positions = table.between(start, end, query.team, query.status)
+    return jsonify({
+        "total": len(positions),
+        "matches": [query.project(table.records[position]) for position in query.page(positions)]
+    })
+
+@app.route('/matches/next', methods=['GET'])
+def get_next_match():
+    """The next match to start in the tracked series (?team=, ?from= (default now))"""
+    team = (request.args.get('team') or '').strip().lower() or None
+    try:
+        start = parse_bound(request.args['from']) if request.args.get('from') else time.time()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    table, error = _schedule_table()
+    if error is not None:
+        return error
+    position = table.next(start, team)
+    if position is None:
+        return jsonify({"error": f"No upcoming match for '{team}'" if team else "No upcoming match"}), 404
+    return jsonify(table.records[position])
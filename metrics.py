@@ -0,0 +1,215 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+
+import payload
+
+# Request and stage timing, exported in Prometheus text format.
+#
+#   with metrics.timed("parse"):
+#       data = parse(html)
+#
+# Stage timings are collected per thread: while a request (or a background
+# job wrapped in collecting()) is running, every timed() stage is added to its
+# Server-Timing header and to the stage histogram under its route. Work a
+# request hands to a thread pool is attributed to it by running each task in
+# joined(current()). Counters and histograms are per worker process.
+
+# Histogram buckets in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_local = threading.local()
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), label_values + (bound,))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), label_values + ('+Inf',))} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {series[-1]:.6f}")
+        return lines
+
+
+def family(name, kind, help, labels, samples):
+    """Exposition lines for a metric family computed at scrape time; samples are (label values, value) pairs."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{_labels(labels, label_values)} {value}" for label_values, value in samples)
+    return lines
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+REQUESTS = Counter("http_requests_total", "Requests served, by route and status.", ("route", "method", "status"))
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "Time to produce a response, by route.", ("route",))
+STAGE_DURATION = Histogram("stage_duration_seconds", "Time spent in each stage (fetch, parse, serialize, ...), by route.", ("route", "stage"))
+UPSTREAM_RESPONSES = Counter("upstream_responses_total", "Upstream responses, by host and status (or exception name).", ("host", "status"))
+PARSE_ERRORS = Counter("parse_errors_total", "Items a parser skipped because they could not be read.", ("parser",))
+
+_metrics = [REQUESTS, REQUEST_DURATION, STAGE_DURATION, UPSTREAM_RESPONSES, PARSE_ERRORS]
+_collectors = []
+
+
+class _Collection:
+    __slots__ = ("route", "stages", "notes")
+
+    def __init__(self, route):
+        self.route = route
+        self.stages = []
+        self.notes = []
+
+
+def _current():
+    return getattr(_local, "collection", None)
+
+
+def current():
+    """The collection of the running request or job (None outside one), to pass to joined() in another thread."""
+    return _current()
+
+
+@contextmanager
+def joined(collection):
+    """Attribute the stages timed inside this block (in this thread) to `collection`."""
+    previous = _current()
+    _local.collection = collection
+    try:
+        yield collection
+    finally:
+        _local.collection = previous
+
+
+def collecting(route):
+    """Attribute the stages timed inside this block (in this thread) to `route`."""
+    return joined(_Collection(route))
+
+
+@contextmanager
+def timed(stage):
+    """Time a stage of the current request or job."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        collection = _current()
+        route = collection.route if collection is not None else "background"
+        STAGE_DURATION.observe(elapsed, route, stage)
+        if collection is not None:
+            collection.stages.append((stage, elapsed))
+
+
+def note(name, description):
+    """Add a description-only entry (e.g. cache;desc=hit) to the current Server-Timing header."""
+    collection = _current()
+    if collection is not None:
+        collection.notes.append((name, description))
+
+
+def add_collector(collect):
+    """Register a callable returning extra exposition lines, run on every /metrics scrape."""
+    _collectors.append(collect)
+
+
+def render():
+    """All metrics in Prometheus text exposition format."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        lines.extend(collect())
+    return "\n".join(lines) + "\n"
+
+
+def server_timing(collection, total):
+    # Repeated stages (e.g. two fetches) are summed into one entry
+    durations = {}
+    for stage, elapsed in collection.stages:
+        durations[stage] = durations.get(stage, 0.0) + elapsed
+    entries = [f'{name};desc="{description}"' for name, description in collection.notes]
+    entries.extend(f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in durations.items())
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class _TimedJSONProvider(payload.JSONProvider):
+    def response(self, *args, **kwargs):
+        with timed("serialize"):
+            return super().response(*args, **kwargs)
+
+
+def init_app(app):
+    """Time every request of `app` (including jsonify) and add its Server-Timing header."""
+    app.json = _TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_timing():
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        g._metrics_start = time.perf_counter()
+        g._metrics_previous = _current()
+        _local.collection = _Collection(route)
+
+    @app.after_request
+    def _finish_timing(response):
+        collection = _current()
+        start = g.get("_metrics_start")
+        if collection is None or start is None:
+            return response
+        total = time.perf_counter() - start
+        REQUEST_DURATION.observe(total, collection.route)
+        REQUESTS.inc(collection.route, request.method, str(response.status_code))
+        response.headers["Server-Timing"] = server_timing(collection, total)
+        return response
+
+    @app.teardown_request
+    def _stop_timing(exc):
+        _local.collection = g.pop("_metrics_previous", None)
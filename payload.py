@@ -0,0 +1,127 @@
+import gzip
+import hashlib
+import json
+import os
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Response bodies serialized and compressed once, served many times.
+#
+# Cached routes and the /live snapshot keep their JSON as bytes together with
+# gzip (and, when the brotli package is installed, br) variants made when the
+# entry is filled. A hit only picks the variant the client accepts. JSON is
+# written with orjson when it is installed; the output matches jsonify's
+# (sorted keys, compact) except that non-ASCII text is sent as UTF-8
+# instead of \u escapes.
+#
+# Every successful GET also carries a strong ETag: the SHA-1 of the JSON,
+# suffixed with the content coding for compressed variants. A request whose
+# If-None-Match matches gets a 304 without a body (init_app).
+
+# Bodies smaller than this are not worth compressing
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "512"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "9"))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "9"))
+
+# Preferred first when the client accepts several with the same weight
+CODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+def dumps(data, default=None):
+    """Compact, key-sorted JSON bytes for `data` (with the trailing newline jsonify adds)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=default, option=_ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; the json module copes
+    return (json.dumps(data, default=default, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def compress(body):
+    """Content-Encoding -> compressed body, for every coding worth sending."""
+    if len(body) < COMPRESS_MIN_SIZE:
+        return {}
+    variants = {"gzip": gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+    return variants
+
+
+def etag(body):
+    """Strong entity tag (unquoted) for a response body."""
+    return hashlib.sha1(body).hexdigest()
+
+
+def negotiate(accept_encoding, available):
+    """The best coding in `available` for an Accept-Encoding header, or None for identity."""
+    if not accept_encoding or not available:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip().lower()] = q
+    best, best_q = None, 0.0
+    for coding in CODINGS:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if coding in available and q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def respond(body, variants, status=200, mimetype="application/json", tag=None):
+    """A response for the current request carrying the best pre-encoded variant of `body` (tag: its etag())."""
+    coding = negotiate(request.headers.get("Accept-Encoding"), variants)
+    response = current_app.response_class(variants[coding] if coding else body, status=status, mimetype=mimetype)
+    if coding:
+        response.headers["Content-Encoding"] = coding
+    if variants:
+        response.vary.add("Accept-Encoding")
+    if tag is not None:
+        # Each encoding is a different representation, so it needs its own strong tag
+        response.set_etag(f"{tag}-{coding}" if coding else tag)
+    return response
+
+
+def init_app(app):
+    """Tag every successful GET of `app` with a strong ETag and answer a matching If-None-Match with 304."""
+
+    @app.after_request
+    def _conditional(response):
+        if request.method not in ("GET", "HEAD") or response.status_code != 200 or response.is_streamed:
+            return response
+        if "ETag" not in response.headers:
+            response.set_etag(etag(response.get_data()))
+        return response.make_conditional(request)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """jsonify through orjson when it is available (see dumps above)."""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and kwargs.get("separators") == (",", ":") and "indent" not in kwargs:
+            try:
+                return orjson.dumps(obj, default=self.default, option=_ORJSON_OPTIONS).decode("utf-8")
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
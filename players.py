@@ -0,0 +1,242 @@
+import bisect
+import contextlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Persistent player-name resolver.
+#
+# Maps normalized player names and aliases to Cricbuzz profile IDs so that
+# /players/<name> can go straight to the profile page instead of asking Google
+# for the link first. The index learns from every successful lookup and from
+# the /profiles/ links on scorecards, and is kept in a JSON file shared by all
+# workers (PLAYER_INDEX_PATH). Writes hold an exclusive lock on a side file
+# and merge with what is on disk, so concurrent workers never drop entries.
+#
+# Besides exact names, a lookup accepts a prefix of whole words ("virat") and
+# a single typo in the surname ("virat kholi"); both must point at exactly
+# one player. Anything looser (another first name, a few letters) is left to
+# the search fallback, since "mohit sharma" is not a misspelling of "rohit
+# sharma".
+
+INDEX_PATH = os.environ.get("PLAYER_INDEX_PATH", "player_index.json")
+# Shortest query accepted as a name prefix
+PREFIX_MIN_LENGTH = 4
+# Shortest surname in which a typo is tolerated
+TYPO_MIN_LENGTH = 4
+
+PROFILE_URL = "https://www.cricbuzz.com/profiles/{id}/{slug}"
+_PROFILE_PATH = re.compile(r"/profiles/(\d+)/([\w-]+)")
+
+# Scorecard decorations around a player's name: "(c)", "(wk)", "†"
+_DECORATIONS = re.compile(r"\([^)]*\)|†")
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(name):
+    """Lower-case, accent-free, punctuation-free form of a player name."""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    name = re.sub(r"[^a-z0-9]+", " ", name.lower().replace("-", " "))
+    return " ".join(name.split())
+
+
+def _one_edit_apart(a, b):
+    """Whether a and b differ by one substitution, insertion, deletion or adjacent transposition."""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diff = [i for i in range(len(a)) if a[i] != b[i]]
+        return len(diff) == 1 or (len(diff) == 2 and diff[1] == diff[0] + 1
+                                   and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]])
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+def parse_profile_url(url):
+    """Return (profile_id, canonical profile URL) for a link to a Cricbuzz profile, or None."""
+    match = _PROFILE_PATH.search(url or "")
+    if not match:
+        return None
+    profile_id, slug = match.groups()
+    return profile_id, PROFILE_URL.format(id=profile_id, slug=slug)
+
+
+class PlayerIndex:
+    """Name -> Cricbuzz profile index with exact, prefix and fuzzy lookup."""
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._profiles = {}   # profile id -> {"id", "url", "name"}
+        self._names = {}      # normalized name/alias -> profile id
+        self._sorted = []     # sorted keys of _names, for prefix search
+        self._loaded_mtime = None
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, force=False):
+        # Pick up entries other workers have written since we last looked
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime == self._loaded_mtime and not force:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read player index %s: %s", self.path, e)
+            return
+        self._profiles.update(data.get("profiles", {}))
+        for name, profile_id in data.get("names", {}).items():
+            self._names.setdefault(name, profile_id)
+        self._sorted = sorted(self._names)
+        self._loaded_mtime = mtime
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        # Serializes read-merge-write cycles across worker processes
+        if fcntl is None:
+            yield
+            return
+        try:
+            lock_file = open(self.path + ".lock", "a")
+        except OSError as e:
+            logger.warning("Could not lock player index %s: %s", self.path, e)
+            yield
+            return
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".player_index.")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"profiles": self._profiles, "names": self._names}, f, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self._loaded_mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            logger.warning("Could not write player index %s: %s", self.path, e)
+
+    def lookup(self, name):
+        """Return the indexed profile for `name` ({"id", "url", "name"}), or None."""
+        key = normalize(name)
+        if not key:
+            return None
+        with self._lock:
+            self._load()
+            profile_id = self._names.get(key) or self._prefix_match(key) or self._fuzzy_match(key)
+            if profile_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(self._profiles[profile_id])
+
+    def _unique(self, names):
+        # The one profile all of `names` belong to, or None if none or several
+        found = None
+        for name in names:
+            profile_id = self._names[name]
+            if found is not None and profile_id != found:
+                return None
+            found = profile_id
+        return found
+
+    def _starting_with(self, prefix):
+        start = bisect.bisect_left(self._sorted, prefix)
+        for name in self._sorted[start:]:
+            if not name.startswith(prefix):
+                break
+            yield name
+
+    def _prefix_match(self, key):
+        # Whole words only ("virat" -> "virat kohli", not "vir"), and only
+        # when every such name belongs to the same player
+        if len(key) < PREFIX_MIN_LENGTH:
+            return None
+        return self._unique(name for name in self._starting_with(key + " "))
+
+    def _fuzzy_match(self, key):
+        # Every word but the surname exactly as indexed, and at least one of
+        # them ("player13" is not a typo of "player1"); the surname one typo away
+        *first, surname = key.split()
+        if not first or len(surname) < TYPO_MIN_LENGTH:
+            return None
+        prefix = " ".join(first) + " "
+        return self._unique(name for name in self._starting_with(prefix)
+                            if name.count(" ") == len(first) and _one_edit_apart(name[len(prefix):], surname))
+
+    def add(self, url, *names):
+        """
+        Record a profile URL under the given names plus the name in its URL slug.
+
+        Only pass names known to belong to the profile (its own page, a
+        scorecard link, a search result for that name), never a query that
+        lookup() only matched by prefix or typo.
+        """
+        return self.add_many([(url, names)])
+
+    def add_many(self, entries):
+        """Record several (profile URL, names) pairs; returns how many names were new."""
+        entries = list(entries)
+        added = 0
+        with self._lock:
+            self._load()
+            if all(self._known(url, names) for url, names in entries):
+                return 0
+        with self._lock, self._file_lock():
+            # Merge into what other workers have written since our last read
+            self._load(force=True)
+            for url, names in entries:
+                parsed = parse_profile_url(url)
+                if parsed is None:
+                    continue
+                profile_id, profile_url = parsed
+                slug_name = profile_url.rsplit("/", 1)[1].replace("-", " ")
+                profile = self._profiles.setdefault(profile_id, {"id": profile_id, "url": profile_url, "name": None})
+                for name in (*names, slug_name):
+                    cleaned = " ".join(_DECORATIONS.sub(" ", name or "").split())
+                    if cleaned and not profile["name"] and name != slug_name:
+                        profile["name"] = cleaned
+                    key = normalize(cleaned)
+                    if key and key not in self._names:
+                        self._names[key] = profile_id
+                        added += 1
+                if not profile["name"]:
+                    profile["name"] = slug_name.title()
+            if added:
+                self._sorted = sorted(self._names)
+                self._save()
+        return added
+
+    def _known(self, url, names):
+        parsed = parse_profile_url(url)
+        if parsed is None:
+            return True
+        slug_name = parsed[1].rsplit("/", 1)[1].replace("-", " ")
+        return parsed[0] in self._profiles and all(
+            normalize(" ".join(_DECORATIONS.sub(" ", name or "").split())) in self._names for name in (*names, slug_name))
+
+    def stats(self):
+        return {"profiles": len(self._profiles), "names": len(self._names), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,86 @@
+# Field projection, filtering and paging for list endpoints.
+#
+#   q = Query.from_args(request.args)        # ValueError -> 400
+#   matches = q.apply(matches, status=lambda m: m["status"], teams=lambda m: (m["team1"], m["team2"]))
+#
+# Applied to the (shared, never mutated) parsed data of a route, so a
+# filtered response only serializes what was asked for:
+#
+#   ?fields=team1,team2,status   keep only these keys of each item
+#   ?status=live|upcoming|completed
+#   ?team=csk                    case-insensitive substring of a team name
+#   ?category=league             case-insensitive substring of the category
+#   ?limit=10&offset=20          page through the filtered items
+#
+# A route passes accessors for the filters it supports; using another one is
+# an error rather than being silently ignored.
+
+STATUSES = ("live", "upcoming", "completed")
+
+
+def _non_negative_int(args, name):
+    value = args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        number = -1
+    if number < 0:
+        raise ValueError(f"'{name}' must be a non-negative integer")
+    return number
+
+
+class Query:
+    """Projection, filters and paging read from a request's query string."""
+
+    def __init__(self, fields=None, status=None, team=None, category=None, limit=None, offset=None):
+        self.fields = fields
+        self.status = status
+        self.team = team
+        self.category = category
+        self.limit = limit
+        self.offset = offset
+
+    @classmethod
+    def from_args(cls, args):
+        """Build from request.args; raises ValueError for a malformed value."""
+        fields = args.get("fields")
+        fields = tuple(f.strip() for f in fields.split(",") if f.strip()) if fields else None
+        status = (args.get("status") or "").strip().lower() or None
+        if status is not None and status not in STATUSES:
+            raise ValueError(f"'status' must be one of {', '.join(STATUSES)}")
+        team = (args.get("team") or "").strip().lower() or None
+        category = (args.get("category") or "").strip().lower() or None
+        return cls(fields, status, team, category, _non_negative_int(args, "limit"), _non_negative_int(args, "offset"))
+
+    def __bool__(self):
+        return any(value is not None for value in (self.fields, self.status, self.team, self.category, self.limit, self.offset))
+
+    def filter(self, items, status=None, teams=None, category=None):
+        """Items passing the status/team/category filters (each accessor takes an item)."""
+        for name, accessor in (("status", status), ("team", teams), ("category", category)):
+            if getattr(self, name) is not None and accessor is None:
+                raise ValueError(f"'{name}' is not supported by this endpoint")
+        if self.status is not None:
+            items = [item for item in items if (status(item) or "").lower() == self.status]
+        if self.team is not None:
+            items = [item for item in items if any(self.team in (name or "").lower() for name in teams(item))]
+        if self.category is not None:
+            items = [item for item in items if self.category in (category(item) or "").lower()]
+        return items
+
+    def page(self, items):
+        start = self.offset or 0
+        return items[start:start + self.limit] if self.limit is not None else items[start:]
+
+    def project(self, item):
+        if self.fields is None or not isinstance(item, dict):
+            return item
+        return {field: item[field] for field in self.fields if field in item}
+
+    def apply(self, items, status=None, teams=None, category=None):
+        """Filter, page and project a list of items; returns a new list."""
+        if not self:
+            return items
+        return [self.project(item) for item in self.page(self.filter(items, status, teams, category))]
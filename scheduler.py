@@ -0,0 +1,291 @@
+import contextlib
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import metrics
+
+# Central refresh policy for upstream pages.
+#
+# How often a page is worth refetching follows from the matches it shows: a
+# live match changes every ball, one starting within the hour soon will, and
+# a finished match (or one days away) hardly changes at all. interval_for()
+# turns the match states on a page into a refresh interval. It sets the
+# period of the background jobs run here (the /live poller, the series
+# catalogue) and the TTL of cached routes that show matches (cache.set_ttl).
+#
+# Every upstream request a worker makes is charged to one budget of
+# UPSTREAM_BUDGET requests per minute. Requests made for a waiting client
+# always go ahead. Background work (scheduled jobs, stale-while-revalidate
+# refreshes) waits or is skipped while the budget is spent, so requests go to
+# the pages that are changing rather than the static ones.
+#
+# A share of the budget (UPSTREAM_BUDGET_RESERVE) is held back for priority
+# jobs: the /live poller, and any job currently refreshing at LIVE_INTERVAL.
+# Client traffic and ordinary background work cannot spend it, so however
+# busy the worker is, live data keeps being polled.
+
+LIVE_INTERVAL = float(os.environ.get("REFRESH_LIVE_INTERVAL", "10"))
+SOON_INTERVAL = float(os.environ.get("REFRESH_SOON_INTERVAL", "60"))
+DEFAULT_INTERVAL = float(os.environ.get("REFRESH_DEFAULT_INTERVAL", "300"))
+IDLE_INTERVAL = float(os.environ.get("REFRESH_IDLE_INTERVAL", "3600"))
+
+# An upcoming match starting within SOON_WINDOW seconds refreshes every
+# SOON_INTERVAL, one within DAY_WINDOW every DEFAULT_INTERVAL; later ones idle
+SOON_WINDOW = 3600
+DAY_WINDOW = 24 * 3600
+
+# Upstream requests per minute per worker (0 disables the budget)
+UPSTREAM_BUDGET = float(os.environ.get("UPSTREAM_BUDGET", "120"))
+# Fraction of the budget only priority jobs may spend
+UPSTREAM_BUDGET_RESERVE = float(os.environ.get("UPSTREAM_BUDGET_RESERVE", "0.25"))
+REFRESH_THREADS = int(os.environ.get("REFRESH_THREADS", "2"))
+
+logger = logging.getLogger(__name__)
+
+
+def _as_datetime(start):
+    if isinstance(start, datetime):
+        return start if start.tzinfo is not None else start.replace(tzinfo=timezone.utc)
+    if isinstance(start, (int, float)):
+        return datetime.fromtimestamp(start, tz=timezone.utc)
+    if isinstance(start, str):
+        try:
+            return _as_datetime(datetime.fromisoformat(start))
+        except ValueError:
+            return None
+    return None
+
+
+def interval_for(matches, now=None):
+    """
+    Refresh interval (seconds) for a page showing `matches`, as (state, start) pairs.
+
+    state is "live", "upcoming" or "completed" (any case); start is a
+    datetime, an ISO 8601 string, epoch seconds or None. The most volatile
+    match decides: any live match gives LIVE_INTERVAL; an upcoming one gives
+    SOON_INTERVAL within the hour (or if it should already have started),
+    DEFAULT_INTERVAL within the day or when its start is unknown. Pages with
+    only completed or far-off matches get IDLE_INTERVAL.
+    """
+    now = now or datetime.now(timezone.utc)
+    interval = IDLE_INTERVAL
+    for state, start in matches:
+        state = (state or "").lower()
+        if state == "live":
+            return LIVE_INTERVAL
+        if state != "upcoming":
+            continue
+        start = _as_datetime(start)
+        if start is None:
+            interval = min(interval, DEFAULT_INTERVAL)
+            continue
+        until = (start - now).total_seconds()
+        if until <= SOON_WINDOW:
+            interval = min(interval, SOON_INTERVAL)
+        elif until <= DAY_WINDOW:
+            interval = min(interval, DEFAULT_INTERVAL)
+    return interval
+
+
+class Budget:
+    """
+    Token bucket of upstream requests: `rate` per minute, bursting to one
+    minute's worth, with `reserve` of it kept for priority work.
+    """
+
+    def __init__(self, rate=UPSTREAM_BUDGET, reserve=UPSTREAM_BUDGET_RESERVE):
+        self.capacity = rate
+        self.per_second = rate / 60.0
+        self.reserved = min(max(1.0, rate * reserve), rate - 1) if rate > 0 else 0.0
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.spent = 0
+        self.deferred = 0
+
+    @contextlib.contextmanager
+    def priority(self):
+        """Requests made (in this thread) inside this block may spend the reserve."""
+        previous = getattr(self._local, "priority", False)
+        self._local.priority = True
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def _floor(self):
+        return 0.0 if getattr(self._local, "priority", False) else self.reserved
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.per_second)
+        self._updated = now
+
+    def charge(self, count=1):
+        """
+        Record upstream requests. They are never refused, but outside a
+        priority() block they only use up the balance down to the reserve.
+        """
+        with self._lock:
+            self.spent += count
+            if self.capacity > 0:
+                self._refill()
+                self._tokens = max(self._tokens - count, min(self._tokens, self._floor()))
+
+    def wait_time(self, priority=False):
+        """Seconds until background work (priority work, if set) may spend another request; 0 if it may now."""
+        if self.capacity <= 0:
+            return 0.0
+        needed = 1 + (0.0 if priority else self.reserved)
+        with self._lock:
+            self._refill()
+            return max(0.0, (needed - self._tokens) / self.per_second)
+
+    def allow(self):
+        """Whether background work may go upstream now; a refusal is counted as a deferral."""
+        if self.wait_time() > 0:
+            self.deferred += 1
+            return False
+        return True
+
+    def tokens(self):
+        if self.capacity <= 0:
+            return None
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class _Job:
+    __slots__ = ("name", "fn", "interval", "priority", "due", "runs", "failures", "last_error")
+
+    def __init__(self, name, fn, interval, priority):
+        self.name = name
+        self.fn = fn
+        self.interval = interval  # the current one, as last returned by fn
+        self.priority = priority
+        self.due = time.time() + interval
+        self.runs = 0
+        self.failures = 0
+        self.last_error = None
+
+
+class RefreshScheduler:
+    """Runs each worker's background refresh jobs when due, within the upstream budget."""
+
+    def __init__(self, budget, threads=REFRESH_THREADS):
+        self.budget = budget
+        self.threads = threads
+        self._jobs = {}
+        self._queue = []  # (due, sequence, job)
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pool = None
+        self._pid = None
+
+    def add(self, name, fn, interval, priority=False):
+        """
+        Run fn() in the background every `interval` seconds, starting `interval` seconds from now.
+
+        fn may return the number of seconds until its next run instead (e.g.
+        from interval_for). A job that is due while the budget is spent waits
+        for it. Priority jobs, and jobs whose current interval is
+        LIVE_INTERVAL or less, may spend the budget's reserve. Adding a name
+        that is already scheduled in this worker does nothing.
+        """
+        with self._cond:
+            if self._pid != os.getpid():
+                # Forked: the parent's thread and pool did not come along
+                self._jobs, self._queue = {}, []
+                self._thread = self._pool = None
+                self._pid = os.getpid()
+            if name in self._jobs:
+                return
+            job = self._jobs[name] = _Job(name, fn, interval, priority)
+            self._push(job)
+            if self._thread is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="refresh-job")
+                self._thread = threading.Thread(target=self._run, name="refresh-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _push(self, job):
+        heapq.heappush(self._queue, (job.due, next(self._sequence), job))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue or self._queue[0][0] > time.time():
+                    self._cond.wait(self._queue[0][0] - time.time() if self._queue else None)
+                _, _, job = heapq.heappop(self._queue)
+                wait = self.budget.wait_time(self._priority(job))
+                if wait > 0:
+                    self.budget.deferred += 1
+                    job.due = time.time() + wait
+                    self._push(job)
+                    continue
+            self._pool.submit(self._execute, job)
+
+    @staticmethod
+    def _priority(job):
+        return job.priority or job.interval <= LIVE_INTERVAL
+
+    def _execute(self, job):
+        try:
+            with metrics.collecting(job.name), (self.budget.priority() if self._priority(job) else contextlib.nullcontext()):
+                result = job.fn()
+            if isinstance(result, (int, float)):
+                job.interval = result
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            logger.warning("Refresh job %s failed: %s", job.name, e)
+        job.runs += 1
+        with self._cond:
+            job.due = time.time() + job.interval
+            self._push(job)
+            self._cond.notify()
+
+    def stats(self):
+        return {name: {"interval": job.interval, "next_in": round(max(0.0, job.due - time.time()), 3),
+                       "runs": job.runs, "failures": job.failures, "last_error": job.last_error}
+                for name, job in list(self._jobs.items())}
+
+
+budget = Budget()
+background = RefreshScheduler(budget)
+
+
+def stats():
+    """Upstream budget and background job state for this worker."""
+    return {"budget": {"per_minute": budget.capacity, "reserved": budget.reserved, "tokens": budget.tokens(),
+                       "spent": budget.spent, "deferred": budget.deferred},
+            "jobs": background.stats()}
+
+
+def _metric_lines():
+    jobs = list(background._jobs.values())
+    tokens = budget.tokens()
+    return (
+        metrics.family("upstream_budget_spent_total", "counter", "Upstream requests charged to the budget.", (), [((), budget.spent)])
+        + metrics.family("upstream_budget_deferrals_total", "counter", "Background refreshes delayed or skipped by the budget.", (), [((), budget.deferred)])
+        + (metrics.family("upstream_budget_tokens", "gauge", "Upstream budget balance, including the reserve.", (), [((), round(tokens, 3))])
+           if tokens is not None else [])
+        + metrics.family("refresh_job_interval_seconds", "gauge", "Current interval of each background refresh job.", ("job",),
+                         [((job.name,), job.interval) for job in jobs])
+        + metrics.family("refresh_job_runs_total", "counter", "Background refresh job runs, by result.", ("job", "result"),
+                         [((job.name, "ok"), job.runs - job.failures) for job in jobs]
+                         + [((job.name, "error"), job.failures) for job in jobs])
+    )
+
+
+metrics.add_collector(_metric_lines)
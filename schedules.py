@@ -0,0 +1,273 @@
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from datetime import date, datetime, timedelta, timezone
+
+import requests
+
+import metrics
+import scheduler
+import upstream
+from standings import slugify
+
+# Columnar store of match schedules, for time-range queries.
+#
+# The matches pages of the tracked series (SCHEDULE_SERIES, plus any series
+# whose schedule is fetched through /ipl-schedule) are merged into one table
+# sorted by start time. Columns are flat arrays: UTC epoch start times, and
+# small integer codes for team, venue and status, interned per table. A time
+# range is two binary searches on the start times. Team and status filters
+# read per-code position arrays (ascending, so also in time order), so a
+# query only touches the rows it returns. Each rebuild is an immutable table
+# swapped in whole; a series is refetched at the interval its match states
+# call for (scheduler.interval_for). Matches without a known start time are
+# left out.
+
+MATCHES_URL = "https://www.cricbuzz.com/cricket-series/{series_id}/{slug}/matches"
+SCHEDULE_SERIES = tuple(int(s) for s in os.environ.get("SCHEDULE_SERIES", "").split(",") if s.strip())
+# Series added from /ipl-schedule requests stop being taken on beyond this
+MAX_SERIES = int(os.environ.get("SCHEDULE_MAX_SERIES", "16"))
+
+_YEAR = re.compile(r"\b(\d{4})\b")
+
+logger = logging.getLogger(__name__)
+
+
+def parse_bound(value, end=False):
+    """
+    Epoch seconds for a ?from= / ?to= value: epoch seconds, an ISO 8601 date
+    or date-time (UTC unless it has an offset). A bare date used as `end`
+    covers that whole day. Raises ValueError.
+    """
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            moment = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+            return (moment + timedelta(days=1) if end else moment).timestamp()
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"'{value}' is not an ISO 8601 date or time, or epoch seconds") from None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _start_time(match):
+    try:
+        return datetime.fromisoformat(match["formatted_date_time"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class _Interned:
+    """Strings to small integer codes, for one table."""
+
+    def __init__(self):
+        self.names = []
+        self.codes = {}
+
+    def code(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+class _Table:
+    __slots__ = ("starts", "team1", "team2", "venue", "status", "records", "teams", "venues", "statuses",
+                 "by_team", "by_status", "built_at")
+
+    def __init__(self, schedules):
+        rows = []
+        for series_id, matches in schedules.items():
+            for match in matches:
+                start = _start_time(match)
+                if start is not None:
+                    rows.append((start, series_id, match))
+        rows.sort(key=lambda row: row[0])
+
+        self.teams, self.venues, self.statuses = _Interned(), _Interned(), _Interned()
+        self.starts = array("d")
+        self.team1, self.team2, self.venue = array("H"), array("H"), array("H")
+        self.status = array("B")
+        self.records = []
+        by_team, by_status = {}, {}
+        for position, (start, series_id, match) in enumerate(rows):
+            team1 = self.teams.code(match["team1"])
+            team2 = self.teams.code(match["team2"])
+            status = self.statuses.code(match["status"].lower())
+            self.starts.append(start)
+            self.team1.append(team1)
+            self.team2.append(team2)
+            self.venue.append(self.venues.code(match["venue"]))
+            self.status.append(status)
+            self.records.append(dict(match, series_id=series_id, start_time=int(start)))
+            for team in {team1, team2}:
+                by_team.setdefault(team, array("I")).append(position)
+            by_status.setdefault(status, array("I")).append(position)
+        self.by_team = by_team
+        self.by_status = by_status
+        self.built_at = time.time()
+
+    def _positions(self, lo, hi, team=None, status=None):
+        """Row positions in [lo, hi), in time order, whose team name contains `team` and with `status`."""
+        status_code = None
+        if status is not None:
+            status_code = self.statuses.codes.get(status)
+            if status_code is None:
+                return []
+        if team is None:
+            if status_code is None:
+                return range(lo, hi)
+            positions = self.by_status[status_code]
+            return positions[bisect.bisect_left(positions, lo):bisect.bisect_left(positions, hi)]
+
+        lists = [self.by_team[code] for code, name in enumerate(self.teams.names) if team in name.lower()]
+        if not lists:
+            return []
+        slices = [positions[bisect.bisect_left(positions, lo):bisect.bisect_left(positions, hi)] for positions in lists]
+        merged = slices[0] if len(slices) == 1 else sorted(set().union(*slices))
+        if status_code is None:
+            return merged
+        status_column = self.status
+        return [position for position in merged if status_column[position] == status_code]
+
+    def between(self, start=None, end=None, team=None, status=None):
+        """Positions of matches starting in [start, end) (epoch seconds; None = unbounded)."""
+        lo = 0 if start is None else bisect.bisect_left(self.starts, start)
+        hi = len(self.starts) if end is None else bisect.bisect_left(self.starts, end)
+        return self._positions(lo, hi, team, status)
+
+    def next(self, now, team=None):
+        """Position of the first match starting at or after `now` (optionally for a team), or None."""
+        positions = self.between(now, None, team)
+        return positions[0] if len(positions) else None
+
+
+class ScheduleStore:
+    """Match schedules of the tracked series as one columnar table, refreshed in the background."""
+
+    def __init__(self, parse, name_for, series=SCHEDULE_SERIES, max_series=MAX_SERIES):
+        self.parse = parse          # (html, year) -> list of match dicts
+        self.name_for = name_for    # series id -> series name, or None if unknown
+        self.max_series = max_series
+        self._series = dict.fromkeys(series)   # series id -> parsed matches (None until loaded)
+        self._sources = {}                      # series id -> (matches page URL, year), when not derived from the name
+        self._table = None
+        self._lock = threading.Lock()
+        self.last_error = None
+        self.rebuilds = 0
+
+    def _source(self, series_id):
+        if series_id in self._sources:
+            return self._sources[series_id]
+        name = self.name_for(series_id)
+        if name is None:
+            raise ValueError(f"Series {series_id} is not known")
+        year = _YEAR.search(name)
+        year = int(year.group(1)) if year else datetime.now(timezone.utc).year
+        return MATCHES_URL.format(series_id=series_id, slug=slugify(name)), year
+
+    def _fetch(self, series_id):
+        url, year = self._source(series_id)
+        matches = upstream.get_parsed(url, self.parse, year)
+        if isinstance(matches, dict) and "error" in matches:
+            raise ValueError(matches["error"])
+        self.update(series_id, matches)
+        return matches
+
+    def _poll(self, series_id):
+        try:
+            matches = self._fetch(series_id)
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        self.last_error = None
+        return scheduler.interval_for((match["status"], match["formatted_date_time"]) for match in matches)
+
+    def _schedule(self, series_id):
+        scheduler.background.add(f"schedule_{series_id}", lambda: self._poll(series_id), scheduler.DEFAULT_INTERVAL)
+
+    def start(self):
+        """
+        Schedule refreshes of every tracked series for this worker process
+        (idempotent: the scheduler ignores a job name it already runs).
+        """
+        for series_id in list(self._series):
+            self._schedule(series_id)
+
+    def update(self, series_id, matches, source=None):
+        """
+        Track a series (if new) with freshly parsed matches; the table is
+        rebuilt if they changed. source is the (URL, year) they were parsed
+        from, for a series whose page URL is not derived from its name. A new
+        series without matches, or beyond max_series, is not taken on.
+        """
+        with self._lock:
+            new = series_id not in self._series
+            if new and (not matches or len(self._series) >= self.max_series):
+                return
+            if source is not None:
+                self._sources[series_id] = source
+            if self._series.get(series_id) is matches:
+                return
+            self._series[series_id] = matches
+            self._table = None
+        if new:
+            self._schedule(series_id)
+
+    def table(self):
+        """
+        The current table, starting the refreshers on first use.
+
+        Series not loaded yet are fetched synchronously. Raises
+        requests.RequestException or ValueError only if no series could be
+        loaded at all.
+        """
+        table = self._table
+        if table is not None:
+            return table
+        # Each worker builds its first table itself, so this schedules its refreshers
+        self.start()
+        error = None
+        for series_id, matches in list(self._series.items()):
+            if matches is None:
+                try:
+                    self._fetch(series_id)
+                except (requests.RequestException, ValueError) as e:
+                    error = e
+                    self.last_error = str(e)
+                    logger.warning("Could not load schedule of series %s: %s", series_id, e)
+        with self._lock:
+            loaded = {series_id: matches for series_id, matches in self._series.items() if matches is not None}
+            if not loaded and error is not None:
+                raise error
+            if self._table is None:
+                self._table = _Table(loaded)
+                self.rebuilds += 1
+            return self._table
+
+    def stats(self):
+        table = self._table
+        return {"series": sorted(self._series), "matches": len(table.starts) if table is not None else 0,
+                "teams": len(table.teams.names) if table is not None else 0,
+                "built_at": table.built_at if table is not None else None,
+                "rebuilds": self.rebuilds, "last_error": self.last_error}
+
+    def metric_lines(self):
+        table = self._table
+        return (
+            metrics.family("schedule_matches", "gauge", "Matches in the columnar schedule table.", (),
+                           [((), len(table.starts) if table is not None else 0)])
+            + metrics.family("schedule_rebuilds_total", "counter", "Schedule table rebuilds.", (), [((), self.rebuilds)])
+        )
@@ -0,0 +1,146 @@
+import bisect
+import itertools
+import os
+import re
+import threading
+import time
+
+import scheduler
+import upstream
+from players import normalize
+
+# In-memory catalogue of the series on Cricbuzz's all-series page.
+#
+# Built from the parsed page and rebuilt by a background job (per worker,
+# scheduler.py) every SERIES_CATALOGUE_REFRESH seconds. Each build is an immutable index
+# swapped in whole, so lookups take no lock: by series ID (dict), by category
+# (dict of lists) and by name prefix (sorted array searched with bisect; every
+# word of a name starts a key, so "premier" finds "Indian Premier League").
+
+ALL_SERIES_URL = "https://www.cricbuzz.com/cricket-schedule/series/all"
+REFRESH_INTERVAL = float(os.environ.get("SERIES_CATALOGUE_REFRESH", "3600"))
+SEARCH_LIMIT = 20
+
+_IPL_NAME = re.compile(r"^indian premier league (\d{4})$")
+
+
+class _Index:
+    __slots__ = ("by_id", "by_category", "keys", "ipl", "built_at")
+
+    def __init__(self, groups):
+        self.by_id = {}
+        self.by_category = {}
+        entries = []
+        for group in groups:
+            category = group["category"]
+            for series in group["series"]:
+                series_id = series["series_id"]
+                if series_id == "N/A" or series_id in self.by_id:
+                    continue
+                entry = {"series_id": series_id, "series_name": series["series_name"], "category": category}
+                self.by_id[series_id] = entry
+                self.by_category.setdefault(normalize(category), []).append(entry)
+                entries.append(entry)
+
+        # (name from one of its words to the end, whether that word is not
+        # the first, series id), sorted for bisect
+        keys = []
+        self.ipl = {}
+        for entry in entries:
+            words = normalize(entry["series_name"]).split()
+            for i in range(len(words)):
+                keys.append((" ".join(words[i:]), i != 0, entry["series_id"]))
+            match = _IPL_NAME.match(" ".join(words))
+            if match:
+                year = int(match.group(1))
+                self.ipl[year] = entry
+                entry["ipl_schedule"] = f"/ipl-schedule/{year}/{entry['series_id']}"
+        keys.sort()
+        self.keys = keys
+        self.built_at = time.time()
+
+
+class SeriesCatalogue:
+    """Series by ID, category and name prefix, rebuilt in the background from the all-series page."""
+
+    def __init__(self, parse, url=ALL_SERIES_URL, interval=REFRESH_INTERVAL):
+        self.parse = parse
+        self.url = url
+        self.interval = interval
+        self.last_error = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Fetch and parse the all-series page now and swap in a new index."""
+        data = upstream.get_parsed(self.url, self.parse)
+        if isinstance(data, dict) and "error" in data:
+            raise ValueError(data["error"])
+        index = _Index(data)
+        self._index = index
+        self.last_error = None
+        return index
+
+    def _poll(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+
+    def start(self):
+        """Schedule refreshes for this worker process (idempotent: the scheduler ignores a name it already runs)."""
+        scheduler.background.add("series_catalogue", self._poll, self.interval)
+
+    def index(self):
+        """
+        The current index, starting the refresher on first use.
+
+        Only the first call in a worker builds it synchronously; it raises
+        requests.RequestException or ValueError if that fails.
+        """
+        self.start()
+        index = self._index
+        if index is None:
+            with self._lock:
+                index = self._index or self.refresh()
+        return index
+
+    def get(self, series_id):
+        return self.index().by_id.get(str(series_id))
+
+    def in_category(self, category):
+        """Series whose category contains `category` (normalized), in page order."""
+        key = normalize(category)
+        return [entry for name, entries in self.index().by_category.items() if key in name for entry in entries]
+
+    def search(self, q, limit=SEARCH_LIMIT, category=None):
+        """Series with a word of their name starting with `q`; whole-name prefix matches first."""
+        index = self.index()
+        prefix = normalize(q)
+        if not prefix:
+            return []
+        category = normalize(category) if category else None
+        found = {}  # series id -> matched only inside the name (not at its start)
+        keys = index.keys
+        for i in range(bisect.bisect_left(keys, (prefix,)), len(keys)):
+            key, is_inner, series_id = keys[i]
+            if not key.startswith(prefix):
+                break
+            if found.get(series_id, True):
+                found[series_id] = is_inner
+        entries = (index.by_id[series_id] for series_id in sorted(found, key=found.get))
+        if category:
+            entries = (entry for entry in entries if category in normalize(entry["category"]))
+        return list(itertools.islice(entries, limit))
+
+    def ipl(self, year):
+        """The catalogue entry for IPL `year`, or None if the all-series page does not list it."""
+        return self.index().ipl.get(year)
+
+    def stats(self):
+        index = self._index
+        if index is None:
+            return {"series": 0, "categories": 0, "built_at": None, "last_error": self.last_error}
+        return {"series": len(index.by_id), "categories": len(index.by_category),
+                "built_at": index.built_at, "last_error": self.last_error}
@@ -0,0 +1,153 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# Second-level route cache shared by every worker on the host.
+#
+# gunicorn runs several worker processes and each keeps its own in-memory
+# route cache (cache.py). Rendered responses are also written here, to a
+# SQLite database in WAL mode, so a worker that misses (or holds an expired
+# copy) picks up what another worker already fetched, and a restarted app
+# starts warm. Background refreshes of a stale entry are leased through the
+# database so only one worker on the host refreshes it.
+#
+# ROUTE_CACHE_DB sets the database file; an empty value disables the shared
+# cache. Database errors are logged and treated as misses.
+
+DB_PATH = os.environ.get("ROUTE_CACHE_DB", "route_cache.sqlite3")
+BUSY_TIMEOUT = float(os.environ.get("ROUTE_CACHE_DB_TIMEOUT", "2"))
+
+# Expired rows are deleted at most this often (seconds)
+PRUNE_INTERVAL = 300
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS route_cache (
+    view TEXT NOT NULL,
+    key TEXT NOT NULL,
+    body BLOB NOT NULL,
+    status INTEGER NOT NULL,
+    mimetype TEXT,
+    stored_at REAL NOT NULL,
+    expires REAL NOT NULL,
+    stale_until REAL NOT NULL,
+    refresh_until REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (view, key)
+) WITHOUT ROWID
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadConnections:
+    """
+    One SQLite connection per thread to the database at `path`, in WAL mode.
+    A connection is reopened after a fork (the parent's must not be used) and
+    setup(conn) runs on each new one, e.g. to create the schema.
+    """
+
+    def __init__(self, path, timeout=BUSY_TIMEOUT, setup=None):
+        self.path = path
+        self.timeout = timeout
+        self.setup = setup
+        self._local = threading.local()
+
+    def get(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        if self.setup is not None:
+            self.setup(conn)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+
+def _setup(conn):
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(_SCHEMA)
+
+
+class SharedCache:
+    """Route-cache entries in a SQLite file, readable and writable by every worker process."""
+
+    def __init__(self, path=DB_PATH, keep=0):
+        self.path = path
+        self.keep = keep  # seconds rows are kept past stale_until (see get's grace)
+        self._connections = ThreadConnections(path, setup=_setup)
+        self._last_prune = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    def _failed(self, action, error):
+        self.errors += 1
+        logger.warning("Shared route cache %s failed (%s): %s", action, self.path, error)
+
+    def get(self, view, key, grace=0):
+        """
+        Return (body, status, mimetype, stored_at, expires, stale_until) if still
+        servable, or at most `grace` seconds past that; else None.
+        """
+        try:
+            row = self._connections.get().execute(
+                "SELECT body, status, mimetype, stored_at, expires, stale_until FROM route_cache"
+                " WHERE view = ? AND key = ? AND stale_until > ?",
+                (view, key, time.time() - grace),
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            return None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row
+
+    def put(self, view, key, body, status, mimetype, stored_at, expires, stale_until):
+        """Store an entry (replacing any previous one and its refresh lease)."""
+        try:
+            conn = self._connections.get()
+            conn.execute(
+                "INSERT OR REPLACE INTO route_cache"
+                " (view, key, body, status, mimetype, stored_at, expires, stale_until, refresh_until)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (view, key, body, status, mimetype, stored_at, expires, stale_until),
+            )
+            self.writes += 1
+            now = time.time()
+            if now - self._last_prune >= PRUNE_INTERVAL:
+                self._last_prune = now
+                conn.execute("DELETE FROM route_cache WHERE stale_until <= ?", (now - self.keep,))
+        except sqlite3.Error as e:
+            self._failed("write", e)
+
+    def claim_refresh(self, view, key, lease):
+        """True if this worker should refresh the entry: nobody else holds an unexpired lease on it."""
+        now = time.time()
+        try:
+            conn = self._connections.get()
+            claimed = conn.execute(
+                "UPDATE route_cache SET refresh_until = ? WHERE view = ? AND key = ? AND refresh_until <= ?",
+                (now + lease, view, key, now),
+            ).rowcount
+            if claimed:
+                return True
+            # No row at all (pruned or never written): nothing to coordinate on
+            return conn.execute("SELECT 1 FROM route_cache WHERE view = ? AND key = ?", (view, key)).fetchone() is None
+        except sqlite3.Error as e:
+            self._failed("lease", e)
+            return True
+
+    def clear(self, view):
+        try:
+            self._connections.get().execute("DELETE FROM route_cache WHERE view = ?", (view,))
+        except sqlite3.Error as e:
+            self._failed("clear", e)
+
+    def stats(self):
+        return {"path": self.path, "hits": self.hits, "misses": self.misses, "writes": self.writes, "errors": self.errors}
@@ -0,0 +1,113 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+import upstream
+
+# Points tables for any number of series.
+#
+# Parsed tables are kept per series ID in a bounded LRU. A table is refetched
+# once it is older than its TTL, which is short while the series has a match
+# in progress and long otherwise. Each series has its own lock, so a slow
+# refresh of one table never holds up requests for another, and concurrent
+# requests for the same stale table share one fetch. A page the parser could
+# not read (an error dict) is only kept for ERROR_TTL seconds, so a bad fetch
+# is retried almost at once instead of being served for a whole TTL.
+
+CACHE_SIZE = int(os.environ.get("POINTS_TABLE_CACHE_SIZE", "32"))
+LIVE_TTL = float(os.environ.get("POINTS_TABLE_LIVE_TTL", "120"))
+IDLE_TTL = float(os.environ.get("POINTS_TABLE_IDLE_TTL", "3600"))
+ERROR_TTL = float(os.environ.get("POINTS_TABLE_ERROR_TTL", "5"))
+
+POINTS_TABLE_URL = "https://www.cricbuzz.com/cricket-series/{series_id}/{slug}/points-table"
+
+
+def slugify(name):
+    """Cricbuzz's URL slug for a series name ("Indian Premier League 2025" -> "indian-premier-league-2025")."""
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+class _Slot:
+    __slots__ = ("lock", "data", "fetched_at", "ttl")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = None
+        self.fetched_at = 0.0
+        self.ttl = 0.0
+
+    def fresh(self):
+        return self.data is not None and time.time() - self.fetched_at < self.ttl
+
+
+class PointsTables:
+    """Parsed points tables by series ID: bounded LRU, live-aware TTLs, one lock per series."""
+
+    def __init__(self, parse, name_for, is_live, maxsize=CACHE_SIZE, live_ttl=LIVE_TTL, idle_ttl=IDLE_TTL,
+                 error_ttl=ERROR_TTL):
+        self.parse = parse
+        self.name_for = name_for    # series id -> series name, or None if unknown
+        self.is_live = is_live      # (series id, series name) -> has a match in progress
+        self.maxsize = maxsize
+        self.live_ttl = live_ttl
+        self.idle_ttl = idle_ttl
+        self.error_ttl = error_ttl
+        self._slots = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _slot(self, series_id):
+        with self._lock:
+            slot = self._slots.get(series_id)
+            if slot is None:
+                slot = self._slots[series_id] = _Slot()
+                while len(self._slots) > self.maxsize:
+                    self._slots.popitem(last=False)
+                    self.evictions += 1
+            self._slots.move_to_end(series_id)
+            return slot
+
+    def get(self, series_id):
+        """
+        The detailed points table of a series (or the parser's error dict).
+
+        Returns None for a series whose name is not known. Raises
+        requests.RequestException if a needed fetch fails.
+        """
+        name = self.name_for(series_id)
+        if name is None:
+            return None
+        slot = self._slot(series_id)
+        if slot.fresh():
+            self.hits += 1
+            return slot.data
+        with slot.lock:
+            if slot.fresh():
+                self.hits += 1
+                return slot.data
+            self.misses += 1
+            url = POINTS_TABLE_URL.format(series_id=series_id, slug=slugify(name))
+            data = upstream.get_parsed(url, self.parse)
+            if isinstance(data, dict) and "error" in data:
+                slot.ttl = self.error_ttl
+            else:
+                slot.ttl = self.live_ttl if self.is_live(series_id, name) else self.idle_ttl
+            slot.fetched_at = time.time()
+            slot.data = data
+            return data
+
+    def stats(self):
+        return {"size": len(self._slots), "maxsize": self.maxsize, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+    def metric_lines(self):
+        return (
+            metrics.family("points_tables_lookups_total", "counter", "Points-table lookups, by result.", ("result",),
+                           [(("hit",), self.hits), (("miss",), self.misses)])
+            + metrics.family("points_tables_cached", "gauge", "Series whose points table is cached.", (), [((), len(self._slots))])
+        )
@@ -0,0 +1,413 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+import scheduler
+
+# Shared upstream HTTP client used by every route in main.py.
+# Each gunicorn worker gets its own requests.Session (and so its own
+# keep-alive connection pool); sessions are never shared across a fork.
+#
+# Each upstream host has a token-bucket rate limit and a circuit breaker.
+# UPSTREAM_BREAKER_FAILURES consecutive failures (connection errors, 5xx), or
+# a single 429, open the breaker. While it is open, requests to that host fail
+# at once with UpstreamUnavailable instead of tying up a worker. The breaker
+# stays open for the failed response's Retry-After if it sent one, otherwise
+# for UPSTREAM_BREAKER_COOLDOWN seconds, doubling with each consecutive
+# opening up to UPSTREAM_BREAKER_MAX_COOLDOWN. Then a single probe request is
+# let through, and its result closes the breaker or opens it again. A request
+# waits at most UPSTREAM_RATE_WAIT seconds for a rate-limit token, and fails
+# with UpstreamUnavailable if it would have to wait longer, so an over-limit
+# host never ties up request threads and cached routes answer with their last
+# good response (cache.py). Callers with nothing cached to fall back on, such
+# as the /players batch, pass a longer rate_wait to be paced instead.
+
+POOL_SIZE = int(os.environ.get("UPSTREAM_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.environ.get("UPSTREAM_READ_TIMEOUT", "10"))
+RETRIES = int(os.environ.get("UPSTREAM_RETRIES", "2"))
+RETRY_BACKOFF = float(os.environ.get("UPSTREAM_RETRY_BACKOFF", "0.3"))
+PAGE_CACHE_SIZE = int(os.environ.get("UPSTREAM_PAGE_CACHE_SIZE", "128"))
+RATE = float(os.environ.get("UPSTREAM_RATE", "5"))  # requests per second per host
+BURST = float(os.environ.get("UPSTREAM_BURST", "10"))
+# Longest wait for a token (seconds) unless the caller passes rate_wait
+RATE_WAIT = float(os.environ.get("UPSTREAM_RATE_WAIT", "0.5"))
+BREAKER_FAILURES = int(os.environ.get("UPSTREAM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("UPSTREAM_BREAKER_COOLDOWN", "5"))
+BREAKER_MAX_COOLDOWN = float(os.environ.get("UPSTREAM_BREAKER_MAX_COOLDOWN", "300"))
+
+# Where requests for each upstream site are actually sent; point these at
+# benchmarks/replay_server.py to run without touching the real sites
+CRICBUZZ_BASE_URL = os.environ.get("CRICBUZZ_BASE_URL", "https://www.cricbuzz.com").rstrip("/")
+GOOGLE_BASE_URL = os.environ.get("GOOGLE_BASE_URL", "https://www.google.com").rstrip("/")
+
+_BASE_URLS = {
+    "https://www.cricbuzz.com": CRICBUZZ_BASE_URL,
+    "https://www.google.com": GOOGLE_BASE_URL,
+}
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    retry = Retry(
+        total=RETRIES,
+        connect=RETRIES,
+        read=RETRIES,
+        status=RETRIES,
+        backoff_factor=RETRY_BACKOFF,
+        # 429 is not retried here, and no Retry-After is slept on inside a
+        # request: both are left to the host's circuit breaker
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+        respect_retry_after_header=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """Return the connection-pooled session for the current worker process."""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = _build_session()
+                _session_pid = pid
+    return _session
+
+
+def resolve_url(url):
+    """Map a canonical upstream URL onto the configured base URL for its site."""
+    for canonical, base in _BASE_URLS.items():
+        if base != canonical and (url == canonical or url.startswith(canonical + "/")):
+            return base + url[len(canonical):]
+    return url
+
+
+# --- Per-host rate limit and circuit breaker ---
+
+class UpstreamUnavailable(requests.ConnectionError):
+    """Raised without sending a request: the host's circuit breaker is open or its rate limit is exhausted."""
+
+    def __init__(self, host, reason, retry_after):
+        super().__init__(f"{host} is unavailable ({reason}); retry in {retry_after:.1f}s")
+        self.host = host
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def retry_after(response):
+    """Seconds from a response's Retry-After header (delay or HTTP date), or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _Host:
+    """Token bucket and circuit breaker for one upstream host."""
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.tokens = BURST
+        self.updated = time.monotonic()
+        self.failures = 0       # consecutive
+        self.opens = 0          # consecutive openings, for the backoff
+        self.open_until = 0.0   # monotonic
+        self.probing = False
+        self.rejected = {"open": 0, "rate_limited": 0}
+
+    def state(self):
+        if self.failures < BREAKER_FAILURES:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half_open"
+
+    def acquire(self, max_wait):
+        """Wait up to max_wait seconds for a token, or raise UpstreamUnavailable."""
+        with self.lock:
+            now = time.monotonic()
+            if self.failures >= BREAKER_FAILURES:
+                if now < self.open_until:
+                    self.rejected["open"] += 1
+                    raise UpstreamUnavailable(self.name, "circuit open", self.open_until - now)
+                if self.probing:
+                    self.rejected["open"] += 1
+                    raise UpstreamUnavailable(self.name, "circuit half-open", BREAKER_COOLDOWN)
+                self.probing = True
+            self.tokens = min(BURST, self.tokens + (now - self.updated) * RATE)
+            self.updated = now
+            wait = (1 - self.tokens) / RATE if self.tokens < 1 else 0.0
+            if wait > max_wait:
+                self.probing = False
+                self.rejected["rate_limited"] += 1
+                raise UpstreamUnavailable(self.name, "rate limited", wait)
+            self.tokens -= 1  # taken now, even if it only becomes available after the wait
+        if wait:
+            with metrics.timed("throttle"):
+                time.sleep(wait)
+
+    def succeeded(self):
+        with self.lock:
+            self.failures = 0
+            self.opens = 0
+            self.probing = False
+
+    def failed(self, delay=None, trip=False):
+        """Count a failure; trip opens the breaker at once (e.g. a 429). delay is the server's Retry-After."""
+        with self.lock:
+            self.probing = False
+            self.failures = BREAKER_FAILURES if trip else self.failures + 1
+            if self.failures >= BREAKER_FAILURES:
+                self.opens += 1
+                if delay is None:
+                    delay = min(BREAKER_MAX_COOLDOWN, BREAKER_COOLDOWN * 2 ** (self.opens - 1))
+                self.open_until = time.monotonic() + delay
+
+    def stats(self):
+        with self.lock:
+            return {"state": self.state(), "failures": self.failures, "opens": self.opens,
+                    "retry_in": round(max(0.0, self.open_until - time.monotonic()), 3),
+                    "tokens": round(self.tokens, 3), "rejected": dict(self.rejected)}
+
+
+_hosts = {}
+_hosts_lock = threading.Lock()
+
+
+def _host(name):
+    host = _hosts.get(name)
+    if host is None:
+        with _hosts_lock:
+            host = _hosts.setdefault(name, _Host(name))
+    return host
+
+
+def get(url, headers=None, timeout=None, rate_wait=None, **kwargs):
+    """
+    GET an upstream URL through the shared session.
+
+    Sends DEFAULT_HEADERS unless headers are given explicitly (pass {} to send
+    the library defaults), and always applies a (connect, read) timeout so a
+    stuck upstream socket cannot pin a worker. Cricbuzz and Google URLs are
+    sent to CRICBUZZ_BASE_URL / GOOGLE_BASE_URL. Every call is charged to
+    the worker's upstream budget (scheduler.py). Raises UpstreamUnavailable
+    without sending anything while the host's breaker is open, or when a
+    rate-limit token is further away than rate_wait seconds (default
+    RATE_WAIT).
+    """
+    if headers is None:
+        headers = DEFAULT_HEADERS
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    host = urlsplit(url).netloc
+    guard = _host(host)
+    guard.acquire(RATE_WAIT if rate_wait is None else rate_wait)
+    scheduler.budget.charge()
+    with metrics.timed("fetch"):
+        try:
+            response = get_session().get(resolve_url(url), headers=headers, timeout=timeout, **kwargs)
+        except requests.RequestException as e:
+            metrics.UPSTREAM_RESPONSES.inc(host, type(e).__name__)
+            guard.failed()
+            raise
+    metrics.UPSTREAM_RESPONSES.inc(host, str(response.status_code))
+    if response.status_code == 429:
+        guard.failed(retry_after(response), trip=True)
+    elif response.status_code >= 500:
+        guard.failed(retry_after(response))
+    else:
+        guard.succeeded()
+    return response
+
+
+# --- Single-flight ---
+# While one thread is fetching and parsing a page, other threads asking for the
+# same page wait for that result instead of issuing their own request.
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+flight_stats = {"leaders": 0, "coalesced": 0}
+
+
+def _single_flight(key, fn, *args):
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+            flight_stats["leaders"] += 1
+        else:
+            flight_stats["coalesced"] += 1
+
+    if not leader:
+        with metrics.timed("wait"):
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = fn(*args)
+        return flight.result
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+# --- Conditional-GET page cache ---
+# Keeps the last body of each upstream page with its validators and a content
+# hash, plus whatever each parser produced from it. Refetches are conditional;
+# a 304 or an unchanged body returns the previous parse result untouched.
+
+class _Page:
+    __slots__ = ("etag", "last_modified", "digest", "body", "parsed", "checked_at")
+
+    def __init__(self, etag, last_modified, digest, body):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.body = body
+        self.parsed = {}
+        self.checked_at = time.time()
+
+
+_pages = OrderedDict()
+_pages_lock = threading.Lock()
+
+
+def _lookup_page(url):
+    with _pages_lock:
+        page = _pages.get(url)
+        if page is not None:
+            _pages.move_to_end(url)
+        return page
+
+
+def _store_page(url, page):
+    with _pages_lock:
+        _pages[url] = page
+        _pages.move_to_end(url)
+        while len(_pages) > PAGE_CACHE_SIZE:
+            _pages.popitem(last=False)
+
+
+def get_parsed(url, parse, *args, headers=None, max_age=None, rate_wait=None):
+    """
+    Fetch an upstream page and return parse(body, *args), skipping the parse
+    when the page has not changed since the last fetch.
+
+    The body is revalidated with If-None-Match / If-Modified-Since. Results are
+    remembered per (parse, args), so several parsers can share one page.
+    With max_age, a page checked less than max_age seconds ago is not
+    refetched at all. Concurrent calls for the same page and parser are
+    coalesced into one fetch. rate_wait is passed on to get(). Raises
+    requests.HTTPError for non-2xx responses.
+    """
+    return _single_flight((url, parse, args), _fetch_parsed, url, parse, args, headers, max_age, rate_wait)
+
+
+def _fetch_parsed(url, parse, args, headers, max_age, rate_wait):
+    page = _lookup_page(url)
+    if max_age is None or page is None or time.time() - page.checked_at >= max_age:
+        page = _revalidate(url, page, headers, rate_wait)
+
+    key = (parse, args)
+    if key in page.parsed:
+        return page.parsed[key]
+    with metrics.timed("parse"):
+        result = parse(page.body, *args)
+    page.parsed[key] = result
+    return result
+
+
+def _revalidate(url, page, headers, rate_wait):
+    request_headers = dict(DEFAULT_HEADERS if headers is None else headers)
+    if page is not None:
+        if page.etag:
+            request_headers['If-None-Match'] = page.etag
+        if page.last_modified:
+            request_headers['If-Modified-Since'] = page.last_modified
+
+    response = get(url, headers=request_headers, rate_wait=rate_wait)
+
+    if response.status_code == 304 and page is not None:
+        page.checked_at = time.time()
+    else:
+        response.raise_for_status()
+        digest = hashlib.sha1(response.content).hexdigest()
+        if page is None or page.digest != digest:
+            page = _Page(response.headers.get('ETag'), response.headers.get('Last-Modified'), digest, response.text)
+        else:
+            # Same body; just pick up any new validators
+            page.etag = response.headers.get('ETag') or page.etag
+            page.last_modified = response.headers.get('Last-Modified') or page.last_modified
+            page.checked_at = time.time()
+        _store_page(url, page)
+    return page
+
+
+def stats():
+    """Page cache, single-flight and per-host breaker state for this worker."""
+    with _flights_lock:
+        flights = dict(flight_stats, in_flight=len(_flights))
+    hosts = {name: host.stats() for name, host in list(_hosts.items())}
+    return {"pages_cached": len(_pages), "single_flight": flights, "hosts": hosts}
+
+
+def _metric_lines():
+    current = stats()
+    flights = current["single_flight"]
+    return (
+        metrics.family("upstream_pages_cached", "gauge", "Upstream pages kept for revalidation.", (), [((), current["pages_cached"])])
+        + metrics.family("upstream_single_flight_total", "counter", "Page fetches that led or joined another in flight.", ("role",),
+                         [(("leader",), flights["leaders"]), (("coalesced",), flights["coalesced"])])
+        + metrics.family("upstream_breaker_open", "gauge", "1 while a host's circuit breaker is open (0.5 half-open).", ("host",),
+                         [((name,), {"closed": 0, "half_open": 0.5, "open": 1}[host["state"]]) for name, host in current["hosts"].items()])
+        + metrics.family("upstream_rejected_total", "counter", "Requests refused without being sent, by host and reason.", ("host", "reason"),
+                         [((name, reason), count) for name, host in current["hosts"].items() for reason, count in host["rejected"].items()])
+    )
+
+
+metrics.add_collector(_metric_lines)